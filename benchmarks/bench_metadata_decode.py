@@ -0,0 +1,146 @@
+"""Microbenchmark: MetadataAccount against the original unpack_metadata_account.
+
+Usage:
+    python benchmarks/bench_metadata_decode.py [corpus.json] [--rounds N]
+
+corpus.json is a JSON list of base64 metadata account blobs, or the raw
+response of a getMultipleAccounts call. Without a corpus the benchmark
+builds accounts with the on-chain Metaplex layout (names padded to 32
+bytes, symbols to 10, URIs to 200, zero to five creators).
+"""
+import os
+import sys
+import json
+import time
+import base64
+import struct
+import random
+import argparse
+import statistics
+import base58
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from metadata_decoder import MetadataAccount, decode_metadata_accounts  # noqa: E402
+
+def legacy_unpack_metadata_account(data):
+    # Verbatim copy of the decoder this module replaced
+    assert(data[0] == 4)
+    i = 1
+    source_account = base58.b58encode(bytes(struct.unpack('<' + "B"*32, data[i:i+32]))).decode('utf-8')
+    i += 32
+    mint_account = base58.b58encode(bytes(struct.unpack('<' + "B"*32, data[i:i+32]))).decode('utf-8')
+    i += 32
+    name_len = struct.unpack('<I', data[i:i+4])[0]
+    i += 4
+    name = struct.unpack('<' + "B"*name_len, data[i:i+name_len])
+    i += name_len
+    symbol_len = struct.unpack('<I', data[i:i+4])[0]
+    i += 4
+    symbol = struct.unpack('<' + "B"*symbol_len, data[i:i+symbol_len])
+    i += symbol_len
+    uri_len = struct.unpack('<I', data[i:i+4])[0]
+    i += 4
+    uri = struct.unpack('<' + "B"*uri_len, data[i:i+uri_len])
+    i += uri_len
+    fee = struct.unpack('<h', data[i:i+2])[0]
+    i += 2
+    has_creator = data[i]
+    i += 1
+    creators = []
+    verified = []
+    share = []
+    if has_creator:
+        creator_len = struct.unpack('<I', data[i:i+4])[0]
+        i += 4
+        for _ in range(creator_len):
+            creator = base58.b58encode(bytes(struct.unpack('<' + "B"*32, data[i:i+32])))
+            creators.append(creator)
+            i += 32
+            verified.append(data[i])
+            i += 1
+            share.append(data[i])
+            i += 1
+    primary_sale_happened = bool(data[i])
+    i += 1
+    is_mutable = bool(data[i])
+    return {
+        "update_authority": source_account,
+        "mint": mint_account,
+        "data": {
+            "name": bytes(name).decode("utf-8").strip("\x00"),
+            "symbol": bytes(symbol).decode("utf-8").strip("\x00"),
+            "uri": bytes(uri).decode("utf-8").strip("\x00"),
+            "seller_fee_basis_points": fee,
+            "creators": creators,
+            "verified": verified,
+            "share": share,
+        },
+        "primary_sale_happened": primary_sale_happened,
+        "is_mutable": is_mutable,
+    }
+
+def build_account(rng):
+    def padded(value, size):
+        raw = value.encode()[:size]
+        return struct.pack('<I', size) + raw + b'\x00' * (size - len(raw))
+    name = ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ ') for _ in range(rng.randint(3, 24)))
+    symbol = ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(rng.randint(2, 8)))
+    uri = 'https://ipfs.io/ipfs/Qm' + ''.join(rng.choice('abcdefghijkmnopqrstuvwxyz123456789') for _ in range(44))
+    creators = rng.randint(0, 5)
+    data = bytes([4]) + rng.randbytes(32) + rng.randbytes(32)
+    data += padded(name, 32) + padded(symbol, 10) + padded(uri, 200)
+    data += struct.pack('<HB', rng.randint(0, 1000), 1 if creators else 0)
+    if creators:
+        data += struct.pack('<I', creators)
+        for _ in range(creators):
+            data += rng.randbytes(32) + bytes([rng.randint(0, 1), 100 // creators])
+    data += bytes([rng.randint(0, 1), 1])
+    # Trailing edition nonce, token standard and collection fields
+    return data + bytes(rng.randint(0, 200))
+
+def load_corpus(path):
+    with open(path) as f:
+        corpus = json.load(f)
+    if isinstance(corpus, dict):
+        corpus = [account['data'][0] for account in corpus['result']['value'] if account]
+    return [base64.b64decode(blob) for blob in corpus]
+
+def bench(label, func, corpus, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(corpus)
+        timings.append((time.perf_counter() - start) / len(corpus) * 1e6)
+    print(f"{label:<40} median {statistics.median(timings):8.2f} us/account   best {min(timings):8.2f} us/account")
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus', nargs='?')
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--accounts', type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        rng = random.Random(42)
+        corpus = [build_account(rng) for _ in range(args.accounts)]
+    encoded = [{"data": [base64.b64encode(blob).decode(), "base64"]} for blob in corpus]
+
+    for blob in corpus:
+        legacy = legacy_unpack_metadata_account(blob)
+        current = MetadataAccount(blob).to_dict()
+        legacy['data']['creators'] = [creator.decode() for creator in legacy['data']['creators']]
+        assert legacy == current, (legacy, current)
+
+    print(f"{len(corpus)} accounts, {args.rounds} rounds")
+    baseline = bench("legacy unpack (swap fields)", lambda c: [legacy_unpack_metadata_account(b)['data']['uri'] for b in c], corpus, args.rounds)
+    lazy = bench("MetadataAccount (name, symbol, uri)", lambda c: [(a.name, a.symbol, a.uri) for a in map(MetadataAccount, c)], corpus, args.rounds)
+    full = bench("MetadataAccount.to_dict()", lambda c: [MetadataAccount(b).to_dict() for b in c], corpus, args.rounds)
+    batch = bench("decode_metadata_accounts (base64, uri)", lambda c: [a.uri for a in decode_metadata_accounts(encoded)], corpus, args.rounds)
+    print(f"speedup: swap fields {baseline / lazy:.1f}x, full decode {baseline / full:.1f}x, batch incl. base64 {baseline / batch:.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,405 @@
+"""Offline replay benchmark for the webhook pipeline.
+
+Replays Helius webhook payloads against the real aiohttp app
+(handle_webhook -> process_webhook -> parse_swaps -> send_embedded_transaction
+-> Dispatcher). RPC, off-chain metadata and Discord are replaced by the
+local stand-ins in benchmarks/stubs.py. Nothing leaves the machine.
+
+Usage:
+    python benchmarks/replay.py [--corpus DIR_OR_FILE] [--webhooks 500]
+        [--concurrency 16] [--rpc-latency 0.05] [--metadata-latency 0.1]
+        [--discord-latency 0.05] [--json results.json] [--compare baseline.json]
+
+A corpus is a JSON file, or a directory of JSON files, each holding one
+recorded webhook body (a list of transactions) or a list of bodies.
+Without --corpus, synthetic swaps with the raw Helius shape are generated.
+The run is seeded, so results are comparable across runs; --compare exits
+non-zero when p95 latency or throughput regresses past --tolerance.
+
+--source websocket pushes the same transactions as logsSubscribe
+notifications from the stub's websocket instead, so they go through
+WebsocketIngest and getTransaction before reaching the pipeline.
+
+--receivers N posts the webhooks to N receiver processes sharing one port,
+which forward the finished alerts to the in-process gateway. Stage timings
+other than discord_send are then measured inside the receivers and not
+reported.
+"""
+import os
+import sys
+import copy
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import contextlib
+import statistics
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import aiohttp  # noqa: E402
+from solders.pubkey import Pubkey # type: ignore # noqa: E402
+from stubs import UpstreamStub, FakeDiscord, FakeChannel  # noqa: E402
+
+SOL_MINT = 'So11111111111111111111111111111111111111112'
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.fmean(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(max(values) * 1000, 3) if values else 0.0,
+    }
+
+def token_balance(index, mint, owner, raw, decimals):
+    return {"accountIndex": index, "mint": mint, "owner": owner, "uiTokenAmount": {"amount": str(raw), "decimals": decimals, "uiAmount": raw / 10 ** decimals, "uiAmountString": str(raw / 10 ** decimals)}}
+
+def synthetic_transaction(rng, wallet, mint, slot):
+    signature = ''.join(rng.choice('123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz') for _ in range(88))
+    buy = rng.random() < 0.5
+    tokens = rng.randint(10 ** 6, 10 ** 12)
+    lamports = rng.randint(10 ** 7, 10 ** 10)
+    pool = str(Pubkey.new_unique())
+    pre = [token_balance(2, mint, pool, 10 ** 15, 6)]
+    post = [token_balance(2, mint, pool, 10 ** 15 + (-tokens if buy else tokens), 6)]
+    if buy:
+        post.append(token_balance(1, mint, wallet, tokens, 6))
+    else:
+        pre.append(token_balance(1, mint, wallet, tokens, 6))
+    change = -lamports if buy else lamports
+    return {
+        "slot": slot,
+        "blockTime": 1700000000 + slot,
+        "meta": {
+            "err": None,
+            "fee": 5000,
+            "preBalances": [10 ** 11, 2039280, 10 ** 12],
+            "postBalances": [10 ** 11 + change - 5000, 2039280, 10 ** 12 - change],
+            "preTokenBalances": pre,
+            "postTokenBalances": post,
+            "innerInstructions": [{"index": 2, "instructions": [{"programIdIndex": 4, "accounts": [0, 1, 2, 3], "data": "3Bxs4h24hBtQy9rw"}] * 6}],
+            "logMessages": [f"Program log: Instruction: Swap {i}" for i in range(40)],
+        },
+        "transaction": {
+            "signatures": [signature],
+            "message": {
+                "accountKeys": [wallet, str(Pubkey.new_unique()), pool, mint, "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"],
+                "instructions": [{"programIdIndex": 4, "accounts": [0, 1, 2], "data": "3Bxs4h24hBtQy9rw"}],
+                "recentBlockhash": str(Pubkey.new_unique()),
+            },
+        },
+        "accountData": [{"account": wallet, "nativeBalanceChange": change - 5000, "tokenBalanceChanges": []}],
+        "tokenTransfers": [{"mint": mint, "fromUserAccount": pool if buy else wallet, "toUserAccount": wallet if buy else pool, "tokenAmount": tokens / 10 ** 6}],
+    }
+
+def synthetic_corpus(rng, webhooks, batch, wallets, mints, unique_mints):
+    wallet_pool = [str(Pubkey.new_unique()) for _ in range(wallets)]
+    mint_pool = [str(Pubkey.new_unique()) for _ in range(mints)]
+    corpus = []
+    slot = 250_000_000
+    for _ in range(webhooks):
+        body = []
+        for _ in range(batch):
+            slot += rng.randint(1, 3)
+            mint = str(Pubkey.new_unique()) if unique_mints else rng.choice(mint_pool)
+            body.append(synthetic_transaction(rng, rng.choice(wallet_pool), mint, slot))
+        corpus.append(body)
+    return corpus
+
+def load_corpus(path):
+    files = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.json')] if os.path.isdir(path) else [path]
+    corpus = []
+    for name in files:
+        with open(name) as f:
+            data = json.load(f)
+        if data and isinstance(data[0], list):
+            corpus.extend(data)
+        else:
+            corpus.append(data)
+    return corpus
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, stage, elapsed):
+        self.samples.setdefault(stage, []).append(elapsed)
+
+    def wrap(self, stage, func):
+        if asyncio.iscoroutinefunction(func):
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+        else:
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+        return timed
+
+def signature_from_embed(embed):
+    for field in embed.fields:
+        if field.name == "Transaction":
+            return field.value.rsplit('/tx/', 1)[1].rstrip(')')
+    return None
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix='wallet-tracker-bench-')
+    os.chdir(workdir)
+    import main
+    import webhook
+    from dispatcher import Dispatcher
+    from dedup import SignatureDedup
+    from ingest import IngestQueue, StartupBuffer
+    from wallet_index import WalletIndex
+    from guild_settings import GuildSettings
+    from prefilter import default_chain
+    from ws_ingest import WebsocketIngest
+    from swap_history import SwapHistory
+    from http_client import http_client
+    from metadata_cache import metadata_cache
+    from database import database
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(rng, args.webhooks, args.batch, args.wallets, args.mints, args.unique_mints)
+    if args.corpus and args.webhooks:
+        corpus = (corpus * (args.webhooks // max(1, len(corpus)) + 1))[:args.webhooks]
+    # Replayed bodies get fresh signatures so the dedup window does not drop them
+    corpus = copy.deepcopy(corpus)
+    for n, body in enumerate(corpus):
+        for transaction in body:
+            transaction['transaction']['signatures'][0] = f"{transaction['transaction']['signatures'][0][:60]}{n:08d}"
+
+    upstream = UpstreamStub(rpc_latency=args.rpc_latency, metadata_latency=args.metadata_latency)
+    await upstream.start()
+    index = WalletIndex()
+    channel_ids = iter(range(1, 10 ** 9))
+    expected = 0
+    for body in corpus:
+        for transaction in body:
+            wallet = transaction['transaction']['message']['accountKeys'][0]
+            if not index.is_tracked(wallet):
+                for guild in range(args.subscribers):
+                    index.add(wallet, guild, next(channel_ids), f"wallet-{wallet[:12]}-{guild}")
+            for balance in transaction['meta'].get('postTokenBalances', []) + transaction['meta'].get('preTokenBalances', []):
+                if balance['mint'] not in upstream.metadata and balance['mint'] != SOL_MINT:
+                    upstream.register_mint(balance['mint'], f"Token {balance['mint'][:4]}", balance['mint'][:4].upper())
+            expected += len(index.get(wallet))
+
+    discord = FakeDiscord(latency=args.discord_latency)
+    timer = StageTimer()
+    webhook.url = upstream.rpc_url
+    webhook.parse_swap = timer.wrap('parse', webhook.parse_swap)
+    webhook.get_multipleAccounts = timer.wrap('rpc', webhook.get_multipleAccounts)
+    webhook.fetch_metaData = timer.wrap('offchain', webhook.fetch_metaData)
+    webhook.send_embedded_transaction = timer.wrap('embed', webhook.send_embedded_transaction)
+    FakeChannel.send = timer.wrap('discord_send', FakeChannel.send)
+
+    await http_client.start()
+    await database.connect()
+    await metadata_cache.setup()
+    bot = main.bot
+    bot.wallet_index = index
+    bot.guild_settings = GuildSettings()
+    bot.prefilter = default_chain(index, bot.guild_settings)
+    bot.swap_history = SwapHistory()
+    await bot.swap_history.start()
+    bot.dedup = SignatureDedup()
+    bot.startup = StartupBuffer()
+    bot.startup_times = {}
+    rate = args.discord_rate or 10 ** 9
+    bot.dispatcher = Dispatcher(discord, rate=rate, per=5 if args.discord_rate else 1)
+    bot.ingest_queue = None
+    if args.mode == 'queue':
+        bot.ingest_queue = IngestQueue(main.run_pipeline, maxsize=args.queue_size, workers=args.workers)
+        await bot.ingest_queue.start()
+    await bot.startup.open(main.ingest_buffered)
+    runner = aiohttp.web.AppRunner(bot.create_app(), access_log=None)
+    await runner.setup()
+    site = aiohttp.web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    endpoint = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/helius-webhook"
+    bot.ws_ingest = None
+    bot.receivers = None
+    if args.receivers:
+        from receivers import ReceiverPool
+        await database.executemany('INSERT INTO wallets (name, address, guild, channel) VALUES (?, ?, ?, ?)',
+                                   [(subscriber.name, address, subscriber.guild, subscriber.channel) for address in index.addresses for subscriber in index.get(address)])
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        os.environ.update({
+            'PYTHONPATH': ROOT, 'SOLANA_RPC_URL': upstream.rpc_url, 'LOG_LEVEL': 'WARNING',
+            'RECEIVER_HOST': '127.0.0.1', 'RECEIVER_PORT': str(port), 'RECEIVER_HEALTH_INTERVAL': '0.2',
+            'INGEST_MODE': args.mode, 'INGEST_WORKERS': str(args.workers), 'INGEST_QUEUE_SIZE': str(args.queue_size),
+        })
+        bot.receivers = ReceiverPool(bot, processes=args.receivers, socket_path=os.path.join(workdir, 'receivers.sock'), health_interval=0.2)
+        await bot.receivers.start()
+        while not all(bot.receivers.healthy(i) for i in range(args.receivers)):
+            await asyncio.sleep(0.05)
+        endpoint = f"http://127.0.0.1:{port}/helius-webhook"
+    if args.source == 'websocket':
+        for body in corpus:
+            for transaction in body:
+                upstream.register_transaction(transaction['transaction']['signatures'][0], transaction)
+        bot.ws_ingest = WebsocketIngest(main.ingest_transactions, index.addresses, ws_url=upstream.ws_url, rpc_url=upstream.rpc_url)
+        await bot.ws_ingest.start()
+        while upstream.ws_subscriptions < len(index):
+            await asyncio.sleep(0.01)
+
+    sent_at = {}
+    receive = []
+    rejected = 0
+    bodies = [json.dumps(body).encode() for body in corpus]
+    queue = asyncio.Queue()
+    for n, body in enumerate(bodies):
+        queue.put_nowait((n, body))
+
+    async def client(session):
+        nonlocal rejected
+        while not queue.empty():
+            n, body = queue.get_nowait()
+            start = time.perf_counter()
+            for transaction in corpus[n]:
+                sent_at[transaction['transaction']['signatures'][0]] = start
+            if args.source == 'websocket':
+                for transaction in corpus[n]:
+                    await upstream.notify(transaction['transaction']['signatures'][0])
+            else:
+                async with session.post(endpoint, data=body, headers={'Content-Type': 'application/json'}) as response:
+                    await response.read()
+                    if response.status != 200:
+                        rejected += 1
+            receive.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(client(session) for _ in range(args.concurrency)))
+        deadline = time.perf_counter() + args.timeout
+        while len(discord.deliveries) < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - started
+
+    first_delivery = {}
+    for channel_id, embed, at in discord.deliveries:
+        signature = signature_from_embed(embed)
+        first_delivery.setdefault(signature, at)
+    end_to_end = [at - sent_at[signature] for signature, at in first_delivery.items() if signature in sent_at]
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key not in ('json', 'compare')},
+        "webhooks": len(corpus),
+        "transactions": sum(len(body) for body in corpus),
+        "alerts_expected": expected,
+        "alerts_delivered": len(discord.deliveries),
+        "rejected": rejected,
+        "elapsed_s": round(elapsed, 3),
+        "webhooks_per_s": round(len(corpus) / elapsed, 2),
+        "end_to_end": summarize(end_to_end),
+        "receive": summarize(receive),
+        "stages": {stage: summarize(values) for stage, values in sorted(timer.samples.items())},
+        "upstream_calls": upstream.calls,
+        "metadata_cache": metadata_cache.stats(),
+    }
+
+    await runner.cleanup()
+    if bot.receivers is not None:
+        results["receivers"] = bot.receivers.stats()
+        await bot.receivers.close()
+    if bot.ws_ingest is not None:
+        await bot.ws_ingest.close()
+    if bot.ingest_queue is not None:
+        await bot.ingest_queue.close()
+    await bot.dispatcher.close()
+    await bot.swap_history.close()
+    await database.close()
+    await http_client.close()
+    await upstream.close()
+    return results
+
+def report(results):
+    print(f"{results['webhooks']} webhooks, {results['transactions']} transactions, {results['alerts_delivered']}/{results['alerts_expected']} alerts in {results['elapsed_s']} s")
+    print(f"throughput: {results['webhooks_per_s']} webhooks/s, rejected: {results['rejected']}")
+    print(f"{'stage':<14}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for name, stats in [("end-to-end", results['end_to_end']), ("receive", results['receive'])] + list(results['stages'].items()):
+        print(f"{name:<14}{stats['count']:>8}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+    print(f"upstream calls: {results['upstream_calls']}")
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for label, current, previous, higher_is_worse in [
+        ("end-to-end p95", results['end_to_end']['p95_ms'], baseline['end_to_end']['p95_ms'], True),
+        ("receive p95", results['receive']['p95_ms'], baseline['receive']['p95_ms'], True),
+        ("webhooks/s", results['webhooks_per_s'], baseline['webhooks_per_s'], False),
+    ]:
+        change = (current - previous) / previous if previous else 0.0
+        worse = change > tolerance if higher_is_worse else change < -tolerance
+        print(f"{label:<16} {previous:>10.2f} -> {current:>10.2f} ({change:+.1%}){'  REGRESSION' if worse else ''}")
+        if worse:
+            regressions.append(label)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus')
+    parser.add_argument('--webhooks', type=int, default=500)
+    parser.add_argument('--batch', type=int, default=1, help="transactions per synthetic webhook")
+    parser.add_argument('--wallets', type=int, default=50)
+    parser.add_argument('--mints', type=int, default=100)
+    parser.add_argument('--unique-mints', action='store_true', help="a fresh mint per transaction (launch-day traffic)")
+    parser.add_argument('--subscribers', type=int, default=2, help="channels subscribed to each wallet")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--mode', choices=['queue', 'inline'], default='queue')
+    parser.add_argument('--source', choices=['webhook', 'websocket'], default='webhook')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--receivers', type=int, default=0, help="receiver processes in front of the gateway")
+    parser.add_argument('--queue-size', type=int, default=10000)
+    parser.add_argument('--rpc-latency', type=float, default=0.0)
+    parser.add_argument('--metadata-latency', type=float, default=0.0)
+    parser.add_argument('--discord-latency', type=float, default=0.0)
+    parser.add_argument('--discord-rate', type=int, default=0, help="messages per 5 s per channel, 0 disables pacing")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="write results to this file")
+    parser.add_argument('--compare', help="baseline results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.corpus:
+        args.corpus = os.path.abspath(args.corpus)
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    results = asyncio.run(run(args))
+    report(results)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+    if compare_path:
+        with open(compare_path) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""Local stand-ins for the services the webhook pipeline talks to.
+
+UpstreamStub is one aiohttp server that answers Solana JSON-RPC calls,
+serves off-chain token metadata JSON and mimics the Helius webhook admin
+API, and a JSON-RPC websocket with logsSubscribe/accountSubscribe for
+the websocket ingestion path. FakeDiscord provides the get_channel/wait_until_ready surface the
+Dispatcher needs and records every delivered embed. All of them can add
+latency so slow upstreams can be simulated.
+"""
+import json
+import time
+import struct
+import base64
+import asyncio
+import discord
+from types import SimpleNamespace
+from aiohttp import web
+from solders.pubkey import Pubkey # type: ignore
+
+TOKEN_METADATA_PROGRAM = Pubkey.from_string("metaqbxxUerdq28cj1RbAWkYQm3ybzjb6a8bt518x1s")
+
+def build_metadata_account(mint: str, name: str, symbol: str, uri: str) -> bytes:
+    def padded(value, size):
+        raw = value.encode()[:size]
+        return struct.pack('<I', size) + raw + b'\x00' * (size - len(raw))
+    data = bytes([4]) + bytes(32) + bytes(Pubkey.from_string(mint))
+    data += padded(name, 32) + padded(symbol, 10) + padded(uri, 200)
+    return data + struct.pack('<HB', 0, 0) + bytes([0, 1])
+
+class UpstreamStub:
+    def __init__(self, rpc_latency: float = 0.0, metadata_latency: float = 0.0, webhook_addresses=None, ipfs_status: int = 200):
+        self.rpc_latency = rpc_latency
+        self.metadata_latency = metadata_latency
+        # Set ipfs_status to an error code to make this instance a failing gateway
+        self.ipfs_status = ipfs_status
+        # The next webhook_put_failures PUTs to the webhook admin API answer 500
+        self.webhook_put_failures = 0
+        self.ipfs = {}
+        self.accounts = {}
+        self.metadata = {}
+        self.transactions = {}
+        self.webhook = {
+            "webhookURL": "http://127.0.0.1/helius-webhook",
+            "transactionTypes": ["SWAP"],
+            "accountAddresses": list(webhook_addresses or []),
+            "webhookType": "raw",
+        }
+        self.calls = {}
+        self.base_url = None
+        self._sockets = set()
+        self._subscriptions = {}
+        self._next_subscription = 0
+        self._runner = None
+
+    def register_mint(self, mint: str, name: str, symbol: str, image: str = "https://example.invalid/logo.png", ipfs: bool = False):
+        """Serve metadata for mint. With ipfs=True the account URI is ipfs://<cid>, served on /ipfs/<cid>."""
+        pda = str(Pubkey.find_program_address([b"metadata", bytes(TOKEN_METADATA_PROGRAM), bytes(Pubkey.from_string(mint))], TOKEN_METADATA_PROGRAM)[0])
+        # The URI is filled in lazily because the port is only known after start()
+        self.accounts[pda] = (mint, name, symbol, ipfs)
+        self.metadata[mint] = {"name": name, "symbol": symbol, "image": image, "twitter": "x.com/example"}
+        if ipfs:
+            self.ipfs[f"cid{mint}"] = self.metadata[mint]
+
+    def register_transaction(self, signature: str, transaction: dict):
+        self.transactions[signature] = transaction
+
+    def _count(self, name: str):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _account(self, pda: str):
+        entry = self.accounts.get(pda)
+        if entry is None:
+            return None
+        mint, name, symbol, ipfs = entry
+        uri = f"ipfs://cid{mint}" if ipfs else f"{self.base_url}/metadata/{mint}"
+        data = build_metadata_account(mint, name, symbol, uri)
+        return {"data": [base64.b64encode(data).decode(), "base64"], "owner": str(TOKEN_METADATA_PROGRAM), "lamports": 5616720, "executable": False, "rentEpoch": 0}
+
+    async def handle_rpc(self, request):
+        body = await request.json()
+        self._count(body['method'])
+        if self.rpc_latency:
+            await asyncio.sleep(self.rpc_latency)
+        method, params = body['method'], body.get('params', [])
+        context = {"slot": 1}
+        if method == 'getAccountInfo':
+            result = {"context": context, "value": self._account(params[0])}
+        elif method == 'getMultipleAccounts':
+            result = {"context": context, "value": [self._account(pda) for pda in params[0]]}
+        elif method == 'getTransaction':
+            result = self.transactions.get(params[0])
+        elif method == 'getSignaturesForAddress':
+            options = params[1] if len(params) > 1 else {}
+            result = []
+            for signature, tx in reversed(self.transactions.items()):
+                if signature == options.get('until') or len(result) >= options.get('limit', 1000):
+                    break
+                if params[0] in tx['transaction']['message']['accountKeys']:
+                    result.append({"signature": signature, "slot": tx.get('slot', 0), "blockTime": tx.get('blockTime'), "err": None})
+        else:
+            return web.json_response({"jsonrpc": "2.0", "id": body.get('id'), "error": {"code": -32601, "message": "Method not found"}})
+        return web.json_response({"jsonrpc": "2.0", "id": body.get('id'), "result": result})
+
+    async def handle_metadata(self, request):
+        self._count('metadata')
+        if self.metadata_latency:
+            await asyncio.sleep(self.metadata_latency)
+        metadata = self.metadata.get(request.match_info['mint'])
+        if metadata is None:
+            raise web.HTTPNotFound()
+        return web.json_response(metadata)
+
+    async def handle_ipfs(self, request):
+        self._count('ipfs')
+        if self.metadata_latency:
+            await asyncio.sleep(self.metadata_latency)
+        if self.ipfs_status != 200:
+            return web.Response(status=self.ipfs_status)
+        metadata = self.ipfs.get(request.match_info['cid'])
+        if metadata is None:
+            raise web.HTTPNotFound()
+        return web.json_response(metadata)
+
+    async def handle_webhook_get(self, request):
+        self._count('webhook_get')
+        return web.json_response(self.webhook)
+
+    async def handle_webhook_put(self, request):
+        self._count('webhook_put')
+        if self.webhook_put_failures:
+            self.webhook_put_failures -= 1
+            raise web.HTTPInternalServerError()
+        self.webhook.update(await request.json())
+        return web.json_response(self.webhook)
+
+    async def handle_ws(self, request):
+        self._count('ws_connect')
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._sockets.add(ws)
+        try:
+            async for message in ws:
+                body = json.loads(message.data)
+                method, params = body['method'], body.get('params', [])
+                self._count(method)
+                if method in ('logsSubscribe', 'accountSubscribe'):
+                    self._next_subscription += 1
+                    address = params[0]['mentions'][0] if method == 'logsSubscribe' else params[0]
+                    self._subscriptions[self._next_subscription] = (ws, method, address)
+                    await ws.send_json({"jsonrpc": "2.0", "id": body['id'], "result": self._next_subscription})
+                elif method in ('logsUnsubscribe', 'accountUnsubscribe'):
+                    removed = self._subscriptions.pop(params[0], None) is not None
+                    await ws.send_json({"jsonrpc": "2.0", "id": body['id'], "result": removed})
+        finally:
+            self._sockets.discard(ws)
+            for subscription, (socket, _, _) in list(self._subscriptions.items()):
+                if socket is ws:
+                    del self._subscriptions[subscription]
+        return ws
+
+    @property
+    def ws_subscriptions(self) -> int:
+        return len(self._subscriptions)
+
+    async def notify(self, signature: str) -> int:
+        """Push notifications for a registered transaction to every matching subscription."""
+        transaction = self.transactions[signature]
+        keys = set(transaction['transaction']['message']['accountKeys'])
+        sent = 0
+        for subscription, (ws, method, address) in list(self._subscriptions.items()):
+            if address not in keys or ws.closed:
+                continue
+            if method == 'logsSubscribe':
+                value = {"signature": signature, "err": None, "logs": []}
+            else:
+                value = {"lamports": 0, "data": ["", "base64"], "owner": "11111111111111111111111111111111", "executable": False, "rentEpoch": 0}
+            await ws.send_json({"jsonrpc": "2.0", "method": method.replace('Subscribe', 'Notification'),
+                                "params": {"subscription": subscription, "result": {"context": {"slot": transaction.get('slot', 0)}, "value": value}}})
+            sent += 1
+        return sent
+
+    async def drop_websockets(self):
+        """Close every websocket connection to exercise reconnects."""
+        for ws in list(self._sockets):
+            await ws.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        app = web.Application()
+        app.add_routes([
+            web.post('/rpc', self.handle_rpc),
+            web.get('/metadata/{mint}', self.handle_metadata),
+            web.get('/ipfs/{cid}', self.handle_ipfs),
+            web.get('/webhooks/{webhook_id}', self.handle_webhook_get),
+            web.put('/webhooks/{webhook_id}', self.handle_webhook_put),
+            web.get('/ws', self.handle_ws),
+        ])
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    @property
+    def rpc_url(self) -> str:
+        return f"{self.base_url}/rpc"
+
+    @property
+    def ws_url(self) -> str:
+        return f"{self.base_url.replace('http', 'ws', 1)}/ws"
+
+    @property
+    def ipfs_gateway(self) -> str:
+        return f"{self.base_url}/ipfs/"
+
+    def webhook_url(self, webhook_id: str = 'stub') -> str:
+        return f"{self.base_url}/webhooks/{webhook_id}"
+
+    async def close(self):
+        await self.drop_websockets()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+class FakeChannel:
+    """Records sent embeds and rejects messages Discord would reject with a 400."""
+    def __init__(self, channel_id: int, sink, latency: float = 0.0):
+        self.id = channel_id
+        self.sink = sink
+        self.latency = latency
+
+    async def send(self, content=None, *, embed=None, embeds=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        items = embeds or ([embed] if embed else [])
+        size = sum(len(item) for item in items)
+        if len(items) > 10 or size > 6000:
+            response = SimpleNamespace(status=400, reason='Bad Request')
+            raise discord.HTTPException(response, {'code': 50035, 'message': f'Invalid Form Body: {len(items)} embeds, {size} characters'})
+        for item in items:
+            self.sink(self.id, item, time.perf_counter())
+
+class FakeDiscord:
+    """The slice of discord.Client used by the Dispatcher."""
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.deliveries = []
+        self._channels = {}
+
+    def _record(self, channel_id, embed, at):
+        self.deliveries.append((channel_id, embed, at))
+
+    def get_channel(self, channel_id: int):
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            channel = self._channels[channel_id] = FakeChannel(channel_id, self._record, self.latency)
+        return channel
+
+    async def wait_until_ready(self):
+        return None
@@ -1,22 +1,30 @@
 # cogs/tracker.py
 import discord
 from discord.ext import commands
-import aiohttp
+import io
+import csv
 import json
+import time
 import logging
+import sqlite3
+import tempfile
 from solders.pubkey import Pubkey # type: ignore
-import os
-from dotenv import load_dotenv
-import aiosqlite
-from typing import Callable, Optional
+from typing import Awaitable, Callable, Optional, Tuple
+from wallet_pages import WalletPages
+from swap_history import HistoryPages
+from database import database
 
 logger = logging.getLogger(__name__)
 
-api_key = os.getenv('HELIUS_KEY')
-webhook_url = "https://api.helius.xyz/v0/webhooks/7723a8c5-233e-4180-83f1-d54c40778539"
+MAX_IMPORT_SIZE = 1024 * 1024
+EXPORT_PAGE_SIZE = 500
+# Exports larger than this are spooled to a temporary file instead of memory
+EXPORT_SPOOL_SIZE = 1024 * 1024
 
 class Pagination(discord.ui.View):
-    def __init__(self, interaction: discord.Interaction, get_page: Callable):
+    # get_page(index) returns (embed, total_pages); it is called on every flip,
+    # so it should serve from a per-view cache such as WalletPages
+    def __init__(self, interaction: discord.Interaction, get_page: Callable[[int], Awaitable[Tuple[discord.Embed, int]]]):
         self.interaction = interaction
         self.get_page = get_page
         self.total_pages: Optional[int] = None
@@ -107,7 +115,7 @@ class Tracker(commands.Cog):
 
     @commands.Cog.listener()
     async def on_ready(self):
-        logger.debug(f"{self.__class__.__name__} is online! running new version V1.4")
+        logger.debug("%s is online! running new version V1.4", self.__class__.__name__)
 
     @staticmethod
     def is_valid_solana_address(address: str) -> bool:
@@ -118,51 +126,46 @@ class Tracker(commands.Cog):
             return False
     
     async def modify_address(self, address: str, action: str):
+        # Changes are batched by the webhook sync and flushed as a single PUT
         if not self.is_valid_solana_address(address):
-            print('Invalid Solana address')
-        
-        headers = {
-            'Content-Type': 'application/json',
-        }
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{webhook_url}?api-key={api_key}", headers=headers) as response:
-                webhook_data = await response.json()
-
-            logger.debug(f"Retrieved webhook data: {webhook_data}")
-            account_addresses = webhook_data.get('accountAddresses', [])
-            logger.debug(f"Current account addresses: {account_addresses}")
-
-            if action == 'add':
-                if address in account_addresses:
-                    print('Address is already in Webhook list')
-                else:
-                    account_addresses.append(address)
-            elif action == 'remove':
-                if address not in account_addresses:
-                    print('Address is not being tracked')
-                else:
-                    account_addresses.remove(address)
-                    logger.debug(f"Address removed from Webhook: {address}")
+            logger.warning('Invalid Solana address %s', address)
+            return
+        if action == 'add':
+            self.bot.webhook_sync.add(address)
+            if self.bot.ws_ingest is not None:
+                self.bot.ws_ingest.subscribe(address)
+        elif action == 'remove':
+            if self.bot.wallet_index.is_tracked(address):
+                logger.debug("%s is still tracked by another server, keeping it in the webhook", address)
             else:
-                print('Invalid action specified')
-
-            logger.debug(f"Updated account addresses: {account_addresses}")
-            
-            update_payload = {
-                "webhookURL": webhook_data.get('webhookURL', ''),
-                "transactionTypes": webhook_data.get('transactionTypes', []),
-                "accountAddresses": account_addresses,
-                "webhookType": webhook_data.get('webhookType', ''),
-            }
-
-            logger.debug(f"Update payload: {update_payload}")
-            
-            async with session.put(f"{webhook_url}?api-key={api_key}", headers=headers, data=json.dumps(update_payload)) as update_response:
-                if update_response.status == 200:
-                    logger.debug(f"Update successful")
-                else:
-                    logger.debug("Failed to update the address list")
-                    return 'Failed to update the address list'
+                self.bot.webhook_sync.remove(address)
+                if self.bot.ws_ingest is not None:
+                    self.bot.ws_ingest.unsubscribe(address)
+        else:
+            logger.error('Invalid action specified: %s', action)
+
+    def reload_receivers(self):
+        # Receiver processes keep their own copy of the wallet index and guild settings
+        if self.bot.receivers is not None:
+            self.bot.receivers.reload()
+
+    @staticmethod
+    def parse_wallet_file(filename: str, content: bytes) -> list:
+        """Parse an import attachment into (address, nametag, channel) rows."""
+        text = content.decode('utf-8-sig')
+        if filename.lower().endswith('.json') or text.lstrip().startswith(('[', '{')):
+            entries = json.loads(text)
+            if isinstance(entries, dict):
+                entries = entries.get('wallets', [])
+        else:
+            entries = list(csv.DictReader(io.StringIO(text)))
+        rows = []
+        for entry in entries:
+            address = str(entry.get('address') or '').strip()
+            nametag = str(entry.get('nametag') or entry.get('name') or '').strip() or address
+            channel = str(entry.get('channel') or '').strip()
+            rows.append((address, nametag, int(channel) if channel.isdigit() else None))
+        return rows
 
     @commands.command()
     async def sync(self, ctx) -> None:
@@ -182,61 +185,187 @@ class Tracker(commands.Cog):
             return
         if nametag is None:
             nametag = address
-        async with aiosqlite.connect("main.db") as db:
-            async with db.cursor() as cursor:
-                await cursor.execute('SELECT * FROM wallets WHERE name = ? AND guild = ?', (nametag, interaction.guild_id,))
-                nametag_data = await cursor.fetchall()
-                if nametag_data:
-                    await interaction.response.defer() 
-                    await interaction.followup.send(f'Nametag "{nametag}" is already being used')
-                    return
-                
-                await cursor.execute('SELECT * FROM wallets WHERE address = ? AND guild = ?', (address, interaction.guild_id,))
-                address_data = await cursor.fetchall()
-                if address_data:
-                    print(address_data)
-                    await interaction.response.defer() 
-                    await interaction.followup.send('Address is already being tracked')
-                    return
-
-                await cursor.execute('INSERT INTO wallets (name, address, guild, channel) VALUES (?, ?, ?, ?)', (nametag, address, interaction.guild_id, channel.id,))
-                await db.commit()
-                await interaction.response.defer() 
-                await self.modify_address(address, 'add')
-                await interaction.followup.send(f'Now tracking address {address} as {nametag}')                                     
+        # The (guild, address) and (guild, name) constraints reject duplicates, so
+        # the common case is one statement; the lookup only runs to explain a conflict
+        inserted = await database.write('INSERT INTO wallets (name, address, guild, channel) VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING',
+                                        (nametag, address, interaction.guild_id, channel.id))
+        await interaction.response.defer()
+        if not inserted:
+            row = await database.fetchone('SELECT name = ? FROM wallets WHERE guild = ? AND (name = ? OR address = ?) ORDER BY name = ? DESC LIMIT 1',
+                                          (nametag, interaction.guild_id, nametag, address, nametag))
+            if row is not None and row[0]:
+                await interaction.followup.send(f'Nametag "{nametag}" is already being used')
+            else:
+                await interaction.followup.send('Address is already being tracked')
+            return
+        self.bot.wallet_index.add(address, interaction.guild_id, channel.id, nametag)
+        self.reload_receivers()
+        await self.modify_address(address, 'add')
+        await interaction.followup.send(f'Now tracking address {address} as {nametag}')
 
     @tracker_group.command(name="remove", description="Untrack an address")
     async def remove(self, interaction: discord.Interaction, address: str):
-        async with aiosqlite.connect("main.db") as db:
-            async with db.cursor() as cursor:
-                await cursor.execute('SELECT * FROM wallets WHERE address = ? AND guild = ?', (address, interaction.guild_id,))
-                data = await cursor.fetchall()
-                if not data:
-                    await interaction.response.defer()
-                    await interaction.followup.send('Address is not being tracked')
-                    return
-                
-                await cursor.execute('DELETE FROM wallets WHERE address = ? AND guild = ?', (address, interaction.guild_id,))
-                await db.commit()
-                await interaction.response.defer()
-                await self.modify_address(address, 'remove')
-                await interaction.followup.send(f'No longer tracking {address}')
+        deleted = await database.write('DELETE FROM wallets WHERE address = ? AND guild = ?', (address, interaction.guild_id))
+        await interaction.response.defer()
+        if not deleted:
+            await interaction.followup.send('Address is not being tracked')
+            return
+        self.bot.wallet_index.remove(address, interaction.guild_id)
+        self.reload_receivers()
+        await self.modify_address(address, 'remove')
+        await interaction.followup.send(f'No longer tracking {address}')
+
+    @tracker_group.command(name="import", description="Track wallets from a CSV or JSON file")
+    async def import_wallets(self, interaction: discord.Interaction, file: discord.Attachment, channel: Optional[discord.TextChannel] = None):
+        await interaction.response.defer()
+        if file.size > MAX_IMPORT_SIZE:
+            await interaction.followup.send('File is too large')
+            return
+        try:
+            rows = self.parse_wallet_file(file.filename, await file.read())
+        except (ValueError, csv.Error, AttributeError) as e:
+            await interaction.followup.send(f'Could not read {file.filename}: {e}')
+            return
+
+        default_channel = channel.id if channel else interaction.channel_id
+        guild_channels = {guild_channel.id for guild_channel in interaction.guild.channels}
+        invalid = {address for address, _, _ in rows if not self.is_valid_solana_address(address)}
+        new_rows = []
+        skipped = 0
+        # Deduping inside the write transaction means no concurrent /tracker add can
+        # land in between, so every row in new_rows is inserted and can be indexed
+        try:
+            async with database.transaction() as conn:
+                existing = await conn.execute_fetchall('SELECT address, name FROM wallets WHERE guild = ?', (interaction.guild_id,))
+                used_addresses = {row[0] for row in existing}
+                used_names = {row[1] for row in existing}
+                for address, nametag, channel_id in rows:
+                    if address in invalid:
+                        continue
+                    if address in used_addresses or nametag in used_names:
+                        skipped += 1
+                        continue
+                    if channel_id not in guild_channels:
+                        channel_id = default_channel
+                    used_addresses.add(address)
+                    used_names.add(nametag)
+                    new_rows.append((nametag, address, interaction.guild_id, channel_id))
+                await conn.executemany('INSERT INTO wallets (name, address, guild, channel) VALUES (?, ?, ?, ?)', new_rows)
+        except sqlite3.IntegrityError as e:
+            logger.error("Wallet import for guild %s rolled back: %s", interaction.guild_id, e)
+            await interaction.followup.send('Import failed, nothing was imported. Please try again')
+            return
+
+        for nametag, address, guild, channel_id in new_rows:
+            self.bot.wallet_index.add(address, guild, channel_id, nametag)
+        if new_rows:
+            self.bot.webhook_sync.add(*(row[1] for row in new_rows))
+            self.reload_receivers()
+            if self.bot.ws_ingest is not None:
+                self.bot.ws_ingest.subscribe(*(row[1] for row in new_rows))
+        message = f'Imported {len(new_rows)} wallets'
+        if skipped:
+            message += f', skipped {skipped} already tracked addresses or nametags'
+        if invalid:
+            message += f', ignored {len(invalid)} invalid addresses'
+        await interaction.followup.send(message)
+
+    @tracker_group.command(name="export", description="Export tracked wallets as CSV")
+    async def export_wallets(self, interaction: discord.Interaction):
+        await interaction.response.defer()
+        # Rows are read a page at a time by id and written straight out, large exports spill to disk
+        data = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+        buffer = io.TextIOWrapper(data, encoding='utf-8', newline='')
+        writer = csv.writer(buffer)
+        writer.writerow(['address', 'nametag', 'channel'])
+        count = 0
+        last_id = 0
+        while True:
+            rows = await database.fetchall('SELECT id, address, name, channel FROM wallets WHERE guild = ? AND id > ? ORDER BY id LIMIT ?',
+                                           (interaction.guild_id, last_id, EXPORT_PAGE_SIZE))
+            writer.writerows(row[1:] for row in rows)
+            count += len(rows)
+            if len(rows) < EXPORT_PAGE_SIZE:
+                break
+            last_id = rows[-1][0]
+        buffer.flush()
+        buffer.detach()
+        data.seek(0)
+        with data:
+            await interaction.followup.send(f'Exported {count} wallets', file=discord.File(data, filename=f'wallets-{interaction.guild_id}.csv'))
+
+    @tracker_group.command(name="threshold", description="Minimum SOL moved for a swap alert")
+    async def threshold(self, interaction: discord.Interaction, min_sol: float):
+        if min_sol < 0:
+            await interaction.response.send_message('The threshold cannot be negative', ephemeral=True)
+            return
+        await self.bot.guild_settings.set_min_lamports(interaction.guild_id, int(min_sol * 10 ** 9))
+        self.reload_receivers()
+        await interaction.response.send_message(f'Swaps moving less than {min_sol} SOL will no longer be posted')
+
+    def tracked_in_guild(self, address: str, guild_id: int) -> bool:
+        return any(subscriber.guild == guild_id for subscriber in self.bot.wallet_index.get(address))
+
+    @tracker_group.command(name="history", description="Recent swaps of a tracked address")
+    async def history(self, interaction: discord.Interaction, address: str, hours: int = 24):
+        if not self.tracked_in_guild(address, interaction.guild_id):
+            await interaction.response.send_message('Address is not being tracked', ephemeral=True)
+            return
+        await self.bot.swap_history.flush()
+        pages = HistoryPages(address, int(time.time()) - hours * 3600)
+
+        async def get_page(index: int):
+            rows = await pages.page(index)
+            total_pages = await pages.total_pages()
+            data = [f"<t:{block_time}:R> {format(round(out_amount, 3), ',')} **{out_symbol}** → {format(round(in_amount, 3), ',')} **{in_symbol}** [tx](https://solscan.io/tx/{signature})"
+                    for block_time, _, signature, out_amount, out_symbol, in_amount, in_symbol in rows]
+
+            # A page of swaps overflows a 1024 character field, the description takes 4096
+            embed = discord.Embed(
+                title="Swap history",
+                description="\n".join([f"Swaps by `{address}` in the last {hours}h:", "", *data]) if data else f"No swaps by `{address}` in the last {hours}h",
+                colour=0xf6ee04,
+            )
+            embed.set_footer(text=f"Page {index}/{total_pages}")
+            return embed, total_pages
+
+        paginator = Pagination(interaction, get_page)
+        await paginator.navigate()
+
+    @tracker_group.command(name="stats", description="Trading stats for a tracked address or a token mint")
+    async def stats(self, interaction: discord.Interaction, target: str, hours: int = 24):
+        await interaction.response.defer()
+        await self.bot.swap_history.flush()
+        since = int(time.time()) - hours * 3600
+        embed = discord.Embed(title="Swap stats", colour=0xf6ee04)
+        if self.tracked_in_guild(target, interaction.guild_id):
+            stats = await self.bot.swap_history.wallet_stats(target, since)
+            embed.description = f"`{target}` in the last {hours}h"
+            embed.add_field(name="Swaps", value=str(stats['swaps']), inline=True)
+            embed.add_field(name="Buys", value=f"{stats['buys']} ({round(stats['sol_spent'], 3)} SOL)", inline=True)
+            embed.add_field(name="Sells", value=f"{stats['sells']} ({round(stats['sol_received'], 3)} SOL)", inline=True)
+            if stats['top']:
+                embed.add_field(name="Most traded", value="\n".join(f"**{symbol or mint[:4]}** `{mint}`: {count}" for mint, symbol, count in stats['top']), inline=False)
+        elif self.is_valid_solana_address(target):
+            guild_wallets = dict(await database.fetchall('SELECT address, name FROM wallets WHERE guild = ?', (interaction.guild_id,)))
+            rows = await self.bot.swap_history.mint_stats(target, since, guild_wallets)
+            lines = [f"**{guild_wallets[address]}**: {buys} buys, {sells} sells" for address, buys, sells in rows[:20]]
+            lines = lines or ["None of your wallets traded this token"]
+            embed.description = "\n".join([f"Tracked wallets trading `{target}` in the last {hours}h", "", *lines])
+        else:
+            await interaction.followup.send('Invalid Solana address')
+            return
+        await interaction.followup.send(embed=embed)
 
     @tracker_group.command(name="list", description="List of tracked addresses")
     async def list_wallets(self, interaction: discord.Interaction):
+        pages = WalletPages(interaction.guild_id)
+
         async def get_page(index: int):
-            async with aiosqlite.connect("main.db") as db:
-                async with db.cursor() as cursor:
-                    await cursor.execute('SELECT name, address FROM wallets WHERE guild = ?', (interaction.guild_id,))
-                    selected_rows = await cursor.fetchall()
-                    nametags = [row[0] for row in selected_rows]
-                    addresses = [row[1] for row in selected_rows]
-
-            per_page = 5
-            total_pages = Pagination.compute_total_pages(len(addresses), per_page)
-            start_index = (index - 1) * per_page
-            end_index = start_index + per_page
-            data = [f"**{i+1}.** [**{nametags[i]}**](https://solscan.io/account/{addresses[i]}): `{addresses[i]}`" for i in range(start_index, min(end_index, len(addresses)))]
+            rows = await pages.page(index)
+            total_pages = await pages.total_pages()
+            start_index = (index - 1) * pages.per_page
+            data = [f"**{start_index + i + 1}.** [**{name}**](https://solscan.io/account/{address}): `{address}`" for i, (_, name, address) in enumerate(rows)]
 
             embed = discord.Embed(
                 title=f"Wallet list",
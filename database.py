@@ -0,0 +1,165 @@
+import os
+import asyncio
+import logging
+import aiosqlite
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv('DB_PATH', 'main.db')
+DB_STATEMENT_CACHE = int(os.getenv('DB_STATEMENT_CACHE', 256))
+
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    # WAL keeps the database consistent with NORMAL, only the last commits can be lost on power failure
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA mmap_size = 134217728',
+)
+
+async def copy_wallets_v2(conn):
+    """Copy wallets into wallets_v2, renaming nametags that repeat in a guild instead of dropping the wallet."""
+    addresses = set()
+    names = set()
+    rows = []
+    for rowid, name, address, guild, channel in await conn.execute_fetchall('SELECT rowid, name, address, guild, channel FROM wallets ORDER BY rowid'):
+        if address is None or guild is None or channel is None:
+            logger.warning("Migration dropped wallets row %d with a missing address, guild or channel: %r", rowid, (name, address, guild, channel))
+            continue
+        address = str(address)
+        if (guild, address) in addresses:
+            logger.warning("Migration dropped wallets row %d: %s is already tracked in guild %s", rowid, address, guild)
+            continue
+        tag = address if name is None else str(name)
+        if name is None:
+            logger.warning("Migration set the missing nametag of wallets row %d to its address %s", rowid, address)
+        if (guild, tag) in names:
+            renamed = f"{tag}-{rowid}"
+            while (guild, renamed) in names:
+                renamed += f"-{rowid}"
+            logger.warning("Migration renamed nametag %r of wallets row %d (%s in guild %s) to %r", tag, rowid, address, guild, renamed)
+            tag = renamed
+        addresses.add((guild, address))
+        names.add((guild, tag))
+        rows.append((rowid, tag, address, guild, channel))
+    await conn.executemany('INSERT INTO wallets_v2 (id, name, address, guild, channel) VALUES (?, ?, ?, ?, ?)', rows)
+
+# (version, steps) applied in order, each in its own transaction; PRAGMA user_version records progress.
+# A step is an SQL statement or a coroutine function taking the connection.
+MIGRATIONS = [
+    (1, [
+        # Schema as created before migrations existed
+        'CREATE TABLE IF NOT EXISTS wallets (name STRING, address STRING , guild INTEGER, channel INTEGER)',
+        'CREATE TABLE IF NOT EXISTS guild_settings (guild INTEGER PRIMARY KEY, min_lamports INTEGER)',
+        'CREATE TABLE IF NOT EXISTS token_metadata (mint TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS metadata_pdas (mint TEXT PRIMARY KEY, pda TEXT NOT NULL)',
+        '''CREATE TABLE IF NOT EXISTS swap_history (
+            signature TEXT NOT NULL, address TEXT NOT NULL, block_time INTEGER NOT NULL, slot INTEGER NOT NULL,
+            mint TEXT NOT NULL, out_mint TEXT, out_amount REAL, out_symbol TEXT, in_mint TEXT, in_amount REAL, in_symbol TEXT,
+            UNIQUE (signature, address))''',
+        'CREATE INDEX IF NOT EXISTS swap_history_address ON swap_history (address, block_time)',
+        'CREATE INDEX IF NOT EXISTS swap_history_mint ON swap_history (mint, block_time)',
+    ]),
+    (2, [
+        # Typed wallets table with one row per (guild, address) and unique nametags per guild.
+        # id aliases the old rowid so existing keyset pagination keeps its order.
+        '''CREATE TABLE wallets_v2 (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            address TEXT NOT NULL,
+            guild INTEGER NOT NULL,
+            channel INTEGER NOT NULL,
+            UNIQUE (guild, address),
+            UNIQUE (guild, name))''',
+        copy_wallets_v2,
+        'DROP TABLE wallets',
+        'ALTER TABLE wallets_v2 RENAME TO wallets',
+        'CREATE INDEX wallets_address ON wallets (address)',
+        'CREATE INDEX wallets_guild ON wallets (guild)',
+        'CREATE INDEX token_metadata_expires ON token_metadata (expires_at)',
+    ]),
+]
+
+class Database:
+    """The bot's single long-lived SQLite connection.
+
+    Opened once in setup_hook, tuned for a write-light, read-mostly workload
+    and migrated to the latest schema. The connection runs in autocommit
+    mode; writes go through write(), executemany() or transaction(), which
+    serialise on a lock so one coroutine's transaction never picks up
+    another's statements. Reads run and fetch in a single call on the
+    connection thread, so no statement is left open across an await; an
+    open read would keep a snapshot that makes a later write fail with
+    "database is locked" once another process has written.
+    """
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._conn = None
+        self._write_lock = asyncio.Lock()
+
+    async def connect(self):
+        if self._conn is not None:
+            return
+        self._conn = await aiosqlite.connect(self.path, isolation_level=None, cached_statements=DB_STATEMENT_CACHE)
+        for pragma in PRAGMAS:
+            await self._conn.execute(pragma)
+        await self.migrate()
+
+    @property
+    def conn(self) -> aiosqlite.Connection:
+        if self._conn is None:
+            raise RuntimeError("Database is not connected, call connect() first")
+        return self._conn
+
+    async def migrate(self):
+        async with self.conn.execute('PRAGMA user_version') as cursor:
+            version = (await cursor.fetchone())[0]
+        for target, steps in MIGRATIONS:
+            if target <= version:
+                continue
+            async with self.transaction() as conn:
+                for step in steps:
+                    if callable(step):
+                        await step(conn)
+                    else:
+                        await conn.execute(step)
+                await conn.execute(f'PRAGMA user_version = {target}')
+            logger.info("Migrated %s to schema version %d", self.path, target)
+
+    async def fetchone(self, sql: str, params=()):
+        rows = await self.conn.execute_fetchall(sql, params)
+        return rows[0] if rows else None
+
+    async def fetchall(self, sql: str, params=()) -> list:
+        return list(await self.conn.execute_fetchall(sql, params))
+
+    async def write(self, sql: str, params=()) -> int:
+        """Run one write statement and return the number of rows it changed."""
+        async with self._write_lock:
+            async with self.conn.execute(sql, params) as cursor:
+                return cursor.rowcount
+
+    async def executemany(self, sql: str, rows) -> int:
+        async with self.transaction() as conn:
+            async with conn.executemany(sql, rows) as cursor:
+                return cursor.rowcount
+
+    @asynccontextmanager
+    async def transaction(self):
+        async with self._write_lock:
+            await self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.conn
+            except BaseException:
+                await self.conn.execute('ROLLBACK')
+                raise
+            await self.conn.execute('COMMIT')
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+database = Database()
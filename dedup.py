@@ -0,0 +1,90 @@
+import os
+import math
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEDUP_WINDOW = float(os.getenv('DEDUP_WINDOW', 600))
+DEDUP_SIZE = int(os.getenv('DEDUP_SIZE', 50000))
+DEDUP_BLOOM_CAPACITY = int(os.getenv('DEDUP_BLOOM_CAPACITY', 0))
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        # Standard sizing: m = -n ln p / (ln 2)^2, k = m/n ln 2
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def clear(self):
+        self._bits = bytearray(len(self._bits))
+
+class SignatureDedup:
+    """Remembers recently handled transaction signatures.
+
+    Signatures are kept in a time-windowed LRU capped at max_size. With
+    bloom_capacity set, two rotating Bloom filter generations front the LRU
+    and cover the whole window, so the exact LRU can stay small; a signature
+    the filters have seen is treated as a duplicate even after it left the LRU
+    (false positive rate is bounded by error_rate).
+    """
+    def __init__(self, window: float = DEDUP_WINDOW, max_size: int = DEDUP_SIZE, bloom_capacity: int = DEDUP_BLOOM_CAPACITY, error_rate: float = 0.001):
+        self.window = window
+        self.max_size = max_size
+        self._seen = OrderedDict()
+        self._blooms = None
+        if bloom_capacity:
+            self._blooms = [BloomFilter(bloom_capacity, error_rate), BloomFilter(bloom_capacity, error_rate)]
+            self._rotated = time.monotonic()
+        self.duplicates = 0
+        self.unique = 0
+
+    def _expire(self, now: float):
+        seen = self._seen
+        while seen:
+            signature, added = next(iter(seen.items()))
+            if now - added < self.window and len(seen) < self.max_size:
+                break
+            seen.popitem(last=False)
+        if self._blooms is not None and now - self._rotated >= self.window:
+            self._blooms.reverse()
+            self._blooms[0].clear()
+            self._rotated = now
+
+    def seen(self, signature: str) -> bool:
+        """Return True if signature was already handled, otherwise record it."""
+        now = time.monotonic()
+        self._expire(now)
+        if signature in self._seen or (self._blooms is not None and any(signature in bloom for bloom in self._blooms)):
+            self.duplicates += 1
+            return True
+        self._seen[signature] = now
+        if self._blooms is not None:
+            self._blooms[0].add(signature)
+        self.unique += 1
+        return False
+
+    def __len__(self):
+        return len(self._seen)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._seen),
+            "unique": self.unique,
+            "duplicates": self.duplicates,
+        }
@@ -0,0 +1,141 @@
+import os
+import time
+import asyncio
+import logging
+import discord
+from collections import deque
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+MAX_EMBEDS_PER_MESSAGE = 10
+# Discord's limit on the combined text of every embed in one message
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+# Discord allows 5 messages per 5 seconds on the per-channel send route
+CHANNEL_RATE = int(os.getenv('DISCORD_CHANNEL_RATE', 5))
+CHANNEL_PER = float(os.getenv('DISCORD_CHANNEL_PER', 5))
+
+class ChannelBucket:
+    """Token bucket mirroring Discord's per-channel message rate limit."""
+    def __init__(self, rate: int = CHANNEL_RATE, per: float = CHANNEL_PER):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def delay(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.per / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def block(self, retry_after: float):
+        self.tokens = 0.0
+        self.blocked_until = time.monotonic() + retry_after
+
+def take_batch(queue: deque) -> list:
+    """Pop the embeds for one message: at most ten, and at least one even if it alone is oversized."""
+    embeds = [queue.popleft()]
+    size = len(embeds[0])
+    while queue and len(embeds) < MAX_EMBEDS_PER_MESSAGE and size + len(queue[0]) <= MAX_EMBED_CHARS_PER_MESSAGE:
+        size += len(queue[0])
+        embeds.append(queue.popleft())
+    return embeds
+
+class Dispatcher:
+    """Per-channel outbound queues that coalesce embeds into a single send.
+
+    Each channel with pending embeds gets its own drain task, so channels are
+    served in parallel while every channel respects its own rate bucket. Up to
+    ten queued embeds, within Discord's 6000 character total, are packed into
+    one channel.send(embeds=[...]).
+    """
+    def __init__(self, bot, rate: int = CHANNEL_RATE, per: float = CHANNEL_PER):
+        self.bot = bot
+        self.rate = rate
+        self.per = per
+        self._queues = {}
+        self._buckets = {}
+        self._tasks = {}
+        self.sent_messages = 0
+        self.sent_embeds = 0
+        self.rate_limited = 0
+        self.failed = 0
+
+    def enqueue(self, channel_id: int, embed: discord.Embed):
+        self._queues.setdefault(channel_id, deque()).append(embed)
+        task = self._tasks.get(channel_id)
+        if task is None or task.done():
+            self._tasks[channel_id] = asyncio.create_task(self._drain(channel_id))
+
+    async def _drain(self, channel_id: int):
+        queue = self._queues[channel_id]
+        bucket = self._buckets.setdefault(channel_id, ChannelBucket(self.rate, self.per))
+        await self.bot.wait_until_ready()
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            logger.warning("Channel %s not found, dropping %d embeds", channel_id, len(queue))
+            self.failed += len(queue)
+            queue.clear()
+            return
+        while queue:
+            delay = bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            embeds = take_batch(queue)
+            bucket.consume()
+            try:
+                with stage('discord_send'):
+                    await channel.send(embeds=embeds)
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    self.rate_limited += 1
+                    bucket.block(getattr(e, 'retry_after', None) or self.per)
+                    queue.extendleft(reversed(embeds))
+                    logger.warning("Rate limited on channel %s, retrying later", channel_id)
+                    continue
+                self.failed += len(embeds)
+                logger.error("Failed to send %d embeds to channel %s: %s", len(embeds), channel_id, e)
+                continue
+            except Exception:
+                # Timeouts and connection errors may or may not have delivered the message, so it is not resent
+                self.failed += len(embeds)
+                logger.exception("Failed to send %d embeds to channel %s", len(embeds), channel_id)
+                continue
+            self.sent_messages += 1
+            self.sent_embeds += len(embeds)
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def flush(self):
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self, timeout: float = 10):
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d undelivered embeds on shutdown", self.pending)
+            for task in self._tasks.values():
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "sent_messages": self.sent_messages,
+            "sent_embeds": self.sent_embeds,
+            "rate_limited": self.rate_limited,
+            "failed": self.failed,
+        }
@@ -0,0 +1,24 @@
+import logging
+from database import database
+from prefilter import PREFILTER_MIN_LAMPORTS
+
+logger = logging.getLogger(__name__)
+
+class GuildSettings:
+    """Per-guild alert settings, cached in memory for the prefilter."""
+    def __init__(self):
+        self._min_lamports = {}
+
+    async def load(self):
+        rows = await database.fetchall('SELECT guild, min_lamports FROM guild_settings')
+        self._min_lamports = {guild: min_lamports for guild, min_lamports in rows if min_lamports is not None}
+        logger.debug("Loaded settings for %d guilds", len(self._min_lamports))
+
+    def min_lamports(self, guild: int) -> int:
+        return self._min_lamports.get(guild, PREFILTER_MIN_LAMPORTS)
+
+    async def set_min_lamports(self, guild: int, min_lamports: int):
+        await database.write('INSERT INTO guild_settings (guild, min_lamports) VALUES (?, ?) ON CONFLICT(guild) DO UPDATE SET min_lamports = excluded.min_lamports', (guild, min_lamports))
+        self._min_lamports[guild] = min_lamports
+
+guild_settings = GuildSettings()
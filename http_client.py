@@ -0,0 +1,53 @@
+import os
+import logging
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+HTTP_LIMIT = int(os.getenv('HTTP_LIMIT', 100))
+HTTP_LIMIT_PER_HOST = int(os.getenv('HTTP_LIMIT_PER_HOST', 20))
+HTTP_DNS_TTL = int(os.getenv('HTTP_DNS_TTL', 300))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3))
+
+class HttpClient:
+    """Long-lived pooled aiohttp session shared by every outbound request.
+
+    MyBot starts it in setup_hook and closes it on shutdown. Connections to
+    Helius, IPFS gateways and the webhook admin API are kept alive and reused.
+    """
+    def __init__(self, limit: int = HTTP_LIMIT, limit_per_host: int = HTTP_LIMIT_PER_HOST, dns_ttl: int = HTTP_DNS_TTL, timeout: float = HTTP_TIMEOUT, connect_timeout: float = HTTP_CONNECT_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=connect_timeout)
+        self._session = None
+
+    async def start(self):
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_ttl,
+            enable_cleanup_closed=True,
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        logger.debug("HTTP client started (limit=%d, per host=%d)", self.limit, self.limit_per_host)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HTTP client has not been started")
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.debug("HTTP client closed")
+        self._session = None
+
+http_client = HttpClient()
+
+def get_session() -> aiohttp.ClientSession:
+    return http_client.session
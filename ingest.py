@@ -0,0 +1,125 @@
+import os
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+INGEST_MODE = os.getenv('INGEST_MODE', 'queue')
+# Where transactions come from: 'webhook', 'websocket' or 'both'
+INGEST_SOURCE = os.getenv('INGEST_SOURCE', 'webhook')
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 1000))
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 4))
+# Receiver processes sharing the webhook port, 0 handles webhooks in the gateway process
+RECEIVER_PROCESSES = int(os.getenv('RECEIVER_PROCESSES', 0))
+# With receivers the gateway serves /queue and /metrics on this port instead
+RECEIVER_STATUS_PORT = int(os.getenv('RECEIVER_STATUS_PORT', 5001))
+# Webhook payloads held while the pipeline is still loading
+STARTUP_BUFFER_SIZE = int(os.getenv('STARTUP_BUFFER_SIZE', 1000))
+
+class IngestQueue:
+    """Bounded queue of webhook payloads drained by a pool of async workers.
+
+    handle_webhook acknowledges Helius as soon as a payload is queued; the
+    workers run the enrichment pipeline in the background. submit() returns
+    False when the queue is full so the endpoint can push back.
+    """
+    def __init__(self, handler, maxsize: int = INGEST_QUEUE_SIZE, workers: int = INGEST_WORKERS):
+        self.handler = handler
+        self.workers = workers
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._tasks = []
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+
+    async def start(self):
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"ingest-worker-{i}"))
+        logger.debug("Started %d ingest workers (queue size %d)", self.workers, self._queue.maxsize)
+
+    async def put(self, payload):
+        """Wait for room instead of rejecting, for payloads that were already acknowledged."""
+        await self._queue.put(payload)
+        self.accepted += 1
+
+    def submit(self, payload) -> bool:
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def _worker(self):
+        while True:
+            payload = await self._queue.get()
+            try:
+                await self.handler(payload)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Error while processing queued webhook")
+            finally:
+                self._queue.task_done()
+
+    async def close(self, timeout: float = 10):
+        # Give the workers a chance to drain what was already acknowledged
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d queued webhooks on shutdown", self.depth)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "capacity": self._queue.maxsize,
+            "workers": self.workers,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+class StartupBuffer:
+    """Holds webhooks that arrive while the bot is still starting.
+
+    The endpoint listens before the wallet index and caches are loaded;
+    payloads received until then are acknowledged and kept here, up to
+    maxsize, then handed to the pipeline in arrival order by open().
+    """
+    def __init__(self, maxsize: int = STARTUP_BUFFER_SIZE):
+        self.maxsize = maxsize
+        self.ready = False
+        self._payloads = deque()
+        self.buffered = 0
+        self.rejected = 0
+
+    def submit(self, payload) -> bool:
+        if len(self._payloads) >= self.maxsize:
+            self.rejected += 1
+            return False
+        self._payloads.append(payload)
+        self.buffered += 1
+        return True
+
+    async def open(self, handler):
+        # Payloads submitted while draining are picked up by the same loop
+        while self._payloads:
+            await handler(self._payloads.popleft())
+        self.ready = True
+        if self.buffered:
+            logger.info("Replayed %d webhooks received during startup", self.buffered)
+
+    def stats(self) -> dict:
+        return {"ready": self.ready, "pending": len(self._payloads), "buffered": self.buffered, "rejected": self.rejected}
@@ -0,0 +1,92 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FILE = os.getenv('LOG_FILE', 'discord.log')
+LOG_CONSOLE_LEVEL = os.getenv('LOG_CONSOLE_LEVEL', 'ERROR').upper()
+# Per-logger budget for DEBUG/INFO records, warnings and errors are never sampled
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 20))
+LOG_SAMPLE_BURST = int(os.getenv('LOG_SAMPLE_BURST', 100))
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+class SamplingFilter(logging.Filter):
+    """Token-bucket rate limit on low-severity records, one bucket per logger.
+
+    Runs before the record is queued, so a dropped record never has its
+    message formatted. The number of suppressed records is kept per logger
+    and reported on the next record that gets through.
+    """
+    def __init__(self, rate: float = LOG_SAMPLE_RATE, burst: int = LOG_SAMPLE_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self.suppressed = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate <= 0:
+            return True
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(record.name, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[record.name] = (tokens, now)
+            self.suppressed[record.name] = self.suppressed.get(record.name, 0) + 1
+            return False
+        self._buckets[record.name] = (tokens - 1, now)
+        record.suppressed = self.suppressed.pop(record.name, 0)
+        return True
+
+class SampledFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            message += f' ({suppressed} similar records suppressed)'
+        return message
+
+_listener = None
+sampler = SamplingFilter()
+
+def setup_logging(level: str = LOG_LEVEL, filename: str = LOG_FILE, console_level: str = LOG_CONSOLE_LEVEL):
+    """Route every log record through a queue to a background writer thread.
+
+    The event loop only pays for the level check, the sampling filter and a
+    queue put; file and console I/O happen on the QueueListener thread.
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    formatter = SampledFormatter(LOG_FORMAT)
+    file_handler = logging.FileHandler(filename, encoding='utf-8', mode='w')
+    file_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(sampler)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,57 +1,174 @@
+import time
+# Taken before the heavy imports so the startup phases include them
+STARTED = time.monotonic()
+from dotenv import load_dotenv
+# Project modules read their settings when imported, so .env has to be loaded first
+load_dotenv()
 import discord
 from discord.ext import commands
 import os
-from dotenv import load_dotenv
 import logging
 import asyncio
-import aiosqlite
 from aiohttp import web
+from database import database
+from metadata_cache import metadata_cache
+from http_client import http_client
+from wallet_index import wallet_index
+from ingest import IngestQueue, StartupBuffer, INGEST_MODE, INGEST_SOURCE, RECEIVER_PROCESSES, RECEIVER_STATUS_PORT
+from dispatcher import Dispatcher
+from dedup import SignatureDedup
+from pda_cache import load_pda_cache, save_pda_cache
+from webhook_sync import WebhookSync
+from guild_settings import guild_settings
+from swap_history import swap_history
+from prefilter import default_chain
+from ws_ingest import WebsocketIngest
+from payload import decode_webhook
+from webhook import process_webhook
+from receivers import ReceiverPool
+from log_setup import setup_logging, stop_logging, sampler
+from metrics import registry, stage, WEBHOOKS, TRANSACTIONS_DROPPED
 
+setup_logging()
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
-
-fh = logging.FileHandler('discord.log', encoding='utf-8', mode='w')
-fh.setLevel(logging.DEBUG)
-
-# Create console handler with a higher log level
-ch = logging.StreamHandler()
-ch.setLevel(logging.ERROR)
-
-# Create formatter and add it to the handlers
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-fh.setFormatter(formatter)
-ch.setFormatter(formatter)
-
-# Add the handlers to the logger
-logger.addHandler(fh)
-logger.addHandler(ch)
-load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
+# Channel greeted on every gateway ready, 0 disables it
+READY_CHANNEL = int(os.getenv('READY_CHANNEL', 443827457062207493))
 
 class MyBot(commands.Bot):
-    async def webhook_setup(self):
+    def create_app(self):
         app = web.Application()
-        app.add_routes([web.post('/helius-webhook', handle_webhook)])
-        runner = web.AppRunner(app)
-        await runner.setup()
-        site = web.TCPSite(runner, '0.0.0.0', 5000)
+        app.add_routes([web.post('/helius-webhook', handle_webhook), web.get('/queue', handle_queue_stats), web.get('/metrics', handle_metrics)])
+        return app
+
+    async def webhook_setup(self):
+        self.runner = web.AppRunner(self.create_app())
+        await self.runner.setup()
+        # Receiver processes own the webhook port, the gateway only serves stats
+        site = web.TCPSite(self.runner, '0.0.0.0', RECEIVER_STATUS_PORT if self.receivers is not None else 5000)
         await site.start()
-    
+
+    def startup_mark(self, phase: str):
+        if phase not in self.startup_times:
+            self.startup_times[phase] = round(time.monotonic() - STARTED, 3)
+            logger.info("Startup phase %s reached after %.2fs", phase, self.startup_times[phase])
+
+    def metrics_setup(self):
+        registry.callback('wallet_tracker_startup_seconds', 'Seconds from process start to each startup phase',
+                          lambda: dict(self.startup_times), labelname='phase')
+        registry.callback('wallet_tracker_startup_buffered_total', 'Webhooks held until the pipeline was loaded',
+                          lambda: self.startup.buffered, type='counter')
+        registry.callback('wallet_tracker_ingest_queue_depth', 'Webhook payloads waiting for a worker',
+                          lambda: self.ingest_queue.depth if self.ingest_queue is not None else None)
+        registry.callback('wallet_tracker_metadata_cache_total', 'Token metadata lookups by cache result',
+                          lambda: {key: value for key, value in metadata_cache.stats().items() if key != 'size'},
+                          type='counter', labelname='result')
+        registry.callback('wallet_tracker_metadata_cache_size', 'Token metadata entries held in memory',
+                          lambda: metadata_cache.stats()['size'])
+        registry.callback('wallet_tracker_dedup_duplicates_total', 'Duplicate signatures seen by the dedup filter',
+                          lambda: self.dedup.duplicates, type='counter')
+        registry.callback('wallet_tracker_discord_rate_limited_total', 'Discord 429 responses on channel sends',
+                          lambda: self.dispatcher.rate_limited, type='counter')
+        registry.callback('wallet_tracker_discord_pending_embeds', 'Embeds queued for delivery to Discord',
+                          lambda: self.dispatcher.pending)
+        registry.callback('wallet_tracker_swap_history_buffered', 'Swaps waiting to be written to the history table',
+                          lambda: self.swap_history.stats()['buffered'])
+        registry.callback('wallet_tracker_swap_history_written_total', 'Swaps written to the history table',
+                          lambda: self.swap_history.written, type='counter')
+        registry.callback('wallet_tracker_log_records_suppressed', 'Log records dropped by sampling since the last one emitted',
+                          lambda: dict(sampler.suppressed), labelname='logger')
+        if self.receivers is not None:
+            registry.callback('wallet_tracker_receiver_up', 'Whether a receiver process is alive and reporting',
+                              lambda: {index: int(self.receivers.healthy(index)) for index in range(self.receivers.processes)}, labelname='receiver')
+            registry.callback('wallet_tracker_receiver_swaps_total', 'Swaps forwarded to the gateway by each receiver',
+                              lambda: dict(self.receivers.forwarded), type='counter', labelname='receiver')
+            registry.callback('wallet_tracker_receiver_restarts_total', 'Receiver processes restarted after exiting',
+                              lambda: self.receivers.restarts, type='counter')
+
     async def load_cogs(self):
         for filename in os.listdir("./cogs"):
             if filename.endswith(".py"):
                 await self.load_extension(f"cogs.{filename[:-3]}") 
 
     async def db_setup(self):
-        async with aiosqlite.connect("main.db") as db:
-            async with db.cursor() as cursor:
-                await cursor.execute('CREATE TABLE IF NOT EXISTS wallets (name STRING, address STRING , guild INTEGER, channel INTEGER)')
-            await db.commit()
+        # The loads share one connection; PDA derivation runs in a thread alongside them
+        await asyncio.gather(metadata_cache.setup(), load_pda_cache(), self.wallet_index.load(),
+                             self.guild_settings.load(), self.webhook_sync.load())
+        await self.swap_history.start()
+
+    async def preload(self):
+        """Load the pipeline state while the gateway connects, then replay the webhooks buffered meanwhile."""
+        try:
+            await self.db_setup()
+            self.startup_mark('preloaded')
+            if INGEST_SOURCE in ('websocket', 'both'):
+                self.ws_ingest = WebsocketIngest(ingest_transactions, self.wallet_index.addresses)
+                await self.ws_ingest.start()
+            await self.startup.open(ingest_buffered)
+        except Exception:
+            logger.exception("Startup failed")
+            await self.close()
+            return
+        self.startup_mark('pipeline_ready')
+        asyncio.create_task(self.webhook_sync.reconcile())
 
     async def setup_hook(self):
+        # discord.py only connects to the gateway once setup_hook returns, so
+        # just the endpoint, the schema and the cogs are awaited here and the
+        # caches load in the background. Alerts queued before the gateway is
+        # ready wait in the dispatcher.
+        self.startup_times = {}
+        self.startup = StartupBuffer()
+        self.http_client = http_client
+        self.database = database
+        self.wallet_index = wallet_index
+        self.guild_settings = guild_settings
+        self.prefilter = default_chain(self.wallet_index, self.guild_settings)
+        self.swap_history = swap_history
+        self.webhook_sync = WebhookSync()
+        self.dispatcher = Dispatcher(self)
+        self.dedup = SignatureDedup()
+        self.ws_ingest = None
+        self.receivers = ReceiverPool(self) if RECEIVER_PROCESSES else None
+        self.ingest_queue = IngestQueue(run_pipeline) if INGEST_MODE == 'queue' else None
+        await self.http_client.start()
+        await self.database.connect()
+        await self.webhook_setup()
+        self.startup_mark('listening')
+        if self.receivers is not None:
+            await self.receivers.start()
+        if self.ingest_queue is not None:
+            await self.ingest_queue.start()
         await self.load_cogs()
-        await self.db_setup()
-        asyncio.create_task(self.webhook_setup())
+        self.metrics_setup()
+        self.preload_task = asyncio.create_task(self.preload(), name="preload")
+
+    async def close(self):
+        preload_task = getattr(self, 'preload_task', None)
+        if preload_task is not None and not preload_task.done() and preload_task is not asyncio.current_task():
+            preload_task.cancel()
+            await asyncio.gather(preload_task, return_exceptions=True)
+        if getattr(self, 'runner', None) is not None:
+            await self.runner.cleanup()
+        if getattr(self, 'receivers', None) is not None:
+            await self.receivers.close()
+        if getattr(self, 'ws_ingest', None) is not None:
+            await self.ws_ingest.close()
+        if getattr(self, 'ingest_queue', None) is not None:
+            await self.ingest_queue.close()
+        if getattr(self, 'dispatcher', None) is not None:
+            await self.dispatcher.close()
+        if getattr(self, 'swap_history', None) is not None:
+            await self.swap_history.close()
+        if getattr(self, 'webhook_sync', None) is not None:
+            await self.webhook_sync.close()
+        if getattr(self, 'database', None) is not None:
+            await save_pda_cache()
+        await super().close()
+        if getattr(self, 'database', None) is not None:
+            await self.database.close()
+        await http_client.close()
+        stop_logging()
 
 intents = discord.Intents.all()
 intents.message_content = True
@@ -60,28 +177,78 @@ bot = MyBot(command_prefix='/', intents=intents)
 
 @bot.event
 async def on_ready():
-    logger.debug('Bot ready!')
-    channel = bot.get_channel(443827457062207493)
-    print(f'Channel is {channel}')
-    await channel.send('Hi')     
-
-def failedtx_check(data):
-    if data[0].get('meta').get('err') is not None:
-        return True
+    bot.startup_mark('gateway_ready')
+    channel = bot.get_channel(READY_CHANNEL)
+    if channel is not None:
+        # Not awaited, a slow send must not hold up the ready event
+        asyncio.create_task(channel.send('Hi'))
+
+async def run_pipeline(data):
+    duplicates = bot.dedup.duplicates
+    data = [transaction for transaction in data if not bot.dedup.seen(transaction['transaction']['signatures'][0])]
+    if bot.dedup.duplicates > duplicates:
+        TRANSACTIONS_DROPPED.inc('duplicate', amount=bot.dedup.duplicates - duplicates)
+        logger.info('Dropped %d duplicate transactions.', bot.dedup.duplicates - duplicates)
+    if data:
+        await process_webhook(data, bot)
+
+async def ingest_transactions(data):
+    """Entry point for transactions that do not arrive through the webhook endpoint."""
+    if bot.ingest_queue is None:
+        await run_pipeline(data)
+    elif not bot.ingest_queue.submit(data):
+        logger.warning("Ingest queue full (%d), dropping %d transactions", bot.ingest_queue.depth, len(data))
+
+async def ingest_buffered(data):
+    # Already acknowledged, so wait for room in the queue rather than drop it
+    if bot.ingest_queue is None:
+        await run_pipeline(data)
     else:
-        return False
+        await bot.ingest_queue.put(data)
 
 async def handle_webhook(request):
-    from webhook import process_webhook
-    data = await request.json()
-    if failedtx_check(data) is True:
-        return logger.info('Transaction failed.')
-    logger.debug(f"Received webhook data: {data}")
-    await process_webhook(data, bot)
-    return web.Response(text="Webhook received")
+    body = await request.read()
+    try:
+        with stage('json_decode'):
+            data = decode_webhook(body)
+    except ValueError as e:
+        WEBHOOKS.inc('invalid')
+        logger.warning("Rejected malformed webhook body (%d bytes): %s", len(body), e)
+        return web.Response(status=400, text="Invalid payload")
+    logger.debug("Received webhook with %d transactions (%d bytes)", len(data), len(body))
+    if not bot.startup.ready:
+        if not bot.startup.submit(data):
+            WEBHOOKS.inc('rejected')
+            return web.Response(status=503, text="Starting up", headers={"Retry-After": "1"})
+        WEBHOOKS.inc('buffered')
+        return web.Response(text="Webhook buffered")
+    if bot.ingest_queue is None:
+        await run_pipeline(data)
+        WEBHOOKS.inc('processed')
+        return web.Response(text="Webhook received")
+    if not bot.ingest_queue.submit(data):
+        WEBHOOKS.inc('rejected')
+        logger.warning("Ingest queue full (%d), rejecting webhook", bot.ingest_queue.depth)
+        return web.Response(status=503, text="Queue full", headers={"Retry-After": "1"})
+    WEBHOOKS.inc('accepted')
+    return web.Response(text="Webhook queued", headers={"X-Queue-Depth": str(bot.ingest_queue.depth)})
+
+async def handle_queue_stats(request):
+    stats = {"mode": INGEST_MODE, "source": INGEST_SOURCE, "startup": dict(bot.startup.stats(), phases=bot.startup_times)}
+    if bot.ingest_queue is not None:
+        stats.update(bot.ingest_queue.stats())
+    stats.update({"dedup": bot.dedup.stats(), "prefilter": bot.prefilter.stats(), "history": bot.swap_history.stats()})
+    if bot.ws_ingest is not None:
+        stats["websocket"] = bot.ws_ingest.stats()
+    if bot.receivers is not None:
+        stats["receivers"] = bot.receivers.stats()
+    return web.json_response(stats)
+
+async def handle_metrics(request):
+    return web.Response(body=registry.render().encode(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
 
 async def main():
     await bot.start(TOKEN)
 
 if __name__ == '__main__':
-    bot.run(TOKEN)
+    bot.run(TOKEN, log_handler=None)
@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import logging
+from database import database
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv('METADATA_CACHE_SIZE', 4096))
+CACHE_TTL = int(os.getenv('METADATA_CACHE_TTL', 86400))
+NEGATIVE_TTL = int(os.getenv('METADATA_NEGATIVE_TTL', 60))
+
+MISSING = object()
+
+class MetadataCache:
+    """Two tiered cache for token metadata.
+
+    Lookups hit an in-process LRU first and fall back to the token_metadata
+    table in the database, so popular mints survive a restart. Mints that failed to
+    resolve are remembered in memory only, for a short negative TTL.
+    """
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: int = CACHE_TTL, negative_ttl: int = NEGATIVE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.db_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    async def setup(self):
+        await database.write('DELETE FROM token_metadata WHERE expires_at <= ?', (time.time(),))
+        rows = await database.fetchall('SELECT mint, data, expires_at FROM token_metadata ORDER BY expires_at DESC LIMIT ?', (self.max_size,))
+        for mint, data, expires_at in reversed(rows):
+            self._remember(mint, tuple(json.loads(data)), expires_at)
+        logger.debug("Loaded %d cached token metadata entries", len(rows))
+
+    def _remember(self, mint: str, value, expires_at: float):
+        self._entries[mint] = (expires_at, value)
+        self._entries.move_to_end(mint)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_local(self, mint: str):
+        entry = self._entries.get(mint)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[mint]
+            return MISSING
+        self._entries.move_to_end(mint)
+        if value is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def get(self, mint: str):
+        """Return the cached metadata tuple, None for a negative hit or MISSING."""
+        value = self.get_local(mint)
+        if value is not MISSING:
+            return value
+        row = await database.fetchone('SELECT data, expires_at FROM token_metadata WHERE mint = ?', (mint,))
+        if row is not None and row[1] > time.time():
+            value = tuple(json.loads(row[0]))
+            self._remember(mint, value, row[1])
+            self.db_hits += 1
+            return value
+        self.misses += 1
+        return MISSING
+
+    async def set(self, mint: str, metadata: tuple, ttl: int = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._remember(mint, tuple(metadata), expires_at)
+        await database.write('INSERT OR REPLACE INTO token_metadata (mint, data, expires_at) VALUES (?, ?, ?)', (mint, json.dumps(list(metadata)), expires_at))
+
+    def set_negative(self, mint: str, ttl: int = None):
+        self._remember(mint, None, time.time() + (self.negative_ttl if ttl is None else ttl))
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+        }
+
+metadata_cache = MetadataCache()
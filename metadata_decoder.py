@@ -0,0 +1,124 @@
+import struct
+import binascii
+from solders.pubkey import Pubkey # type: ignore
+
+METADATA_KEY = 4
+
+_HEADER = struct.Struct('<B32s32sI')
+_U32 = struct.Struct('<I')
+_TAIL = struct.Struct('<HB')
+_CREATOR = struct.Struct('<32sBB')
+
+class MetadataAccount:
+    """Lazy decoder for a Metaplex token metadata account.
+
+    Only the offsets of the variable length fields are computed up front.
+    Strings and pubkeys are decoded from the underlying memoryview when first
+    accessed, and creators are not parsed unless asked for.
+    """
+    __slots__ = ('_buf', '_name', '_symbol', '_uri', '_tail')
+
+    def __init__(self, data):
+        buf = memoryview(data)
+        key, _, _, name_len = _HEADER.unpack_from(buf, 0)
+        if key != METADATA_KEY:
+            raise ValueError(f"Not a metadata account (key {key})")
+        i = _HEADER.size
+        self._name = (i, i + name_len)
+        i += name_len
+        symbol_len = _U32.unpack_from(buf, i)[0]
+        i += 4
+        self._symbol = (i, i + symbol_len)
+        i += symbol_len
+        uri_len = _U32.unpack_from(buf, i)[0]
+        i += 4
+        self._uri = (i, i + uri_len)
+        self._tail = i + uri_len
+        if self._tail + _TAIL.size > len(buf):
+            raise ValueError("Truncated metadata account")
+        self._buf = buf
+
+    def _string(self, span) -> str:
+        return str(self._buf[span[0]:span[1]], 'utf-8').strip('\x00')
+
+    @property
+    def name(self) -> str:
+        return self._string(self._name)
+
+    @property
+    def symbol(self) -> str:
+        return self._string(self._symbol)
+
+    @property
+    def uri(self) -> str:
+        return self._string(self._uri)
+
+    @property
+    def update_authority(self) -> str:
+        return str(Pubkey.from_bytes(bytes(self._buf[1:33])))
+
+    @property
+    def mint(self) -> str:
+        return str(Pubkey.from_bytes(bytes(self._buf[33:65])))
+
+    @property
+    def seller_fee_basis_points(self) -> int:
+        return _TAIL.unpack_from(self._buf, self._tail)[0]
+
+    def _creators_end(self) -> int:
+        i = self._tail + _TAIL.size
+        if not self._buf[i - 1]:
+            return i
+        return i + 4 + _U32.unpack_from(self._buf, i)[0] * _CREATOR.size
+
+    @property
+    def creators(self) -> list:
+        """List of (address, verified, share) tuples."""
+        i = self._tail + _TAIL.size
+        if not self._buf[i - 1]:
+            return []
+        count = _U32.unpack_from(self._buf, i)[0]
+        return [
+            (str(Pubkey.from_bytes(address)), verified, share)
+            for address, verified, share in _CREATOR.iter_unpack(self._buf[i + 4:i + 4 + count * _CREATOR.size])
+        ]
+
+    @property
+    def primary_sale_happened(self) -> bool:
+        return bool(self._buf[self._creators_end()])
+
+    @property
+    def is_mutable(self) -> bool:
+        return bool(self._buf[self._creators_end() + 1])
+
+    def to_dict(self) -> dict:
+        creators = self.creators
+        return {
+            "update_authority": self.update_authority,
+            "mint": self.mint,
+            "data": {
+                "name": self.name,
+                "symbol": self.symbol,
+                "uri": self.uri,
+                "seller_fee_basis_points": self.seller_fee_basis_points,
+                "creators": [creator[0] for creator in creators],
+                "verified": [creator[1] for creator in creators],
+                "share": [creator[2] for creator in creators],
+            },
+            "primary_sale_happened": self.primary_sale_happened,
+            "is_mutable": self.is_mutable,
+        }
+
+def decode_metadata_accounts(accounts) -> list:
+    """Decode the account values returned by getMultipleAccounts.
+
+    Missing or malformed accounts decode to None so results stay aligned
+    with the requested keys.
+    """
+    decoded = []
+    for account in accounts:
+        try:
+            decoded.append(MetadataAccount(binascii.a2b_base64(account['data'][0])))
+        except (TypeError, KeyError, IndexError, ValueError, struct.error, binascii.Error):
+            decoded.append(None)
+    return decoded
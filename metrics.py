@@ -0,0 +1,156 @@
+import time
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+class Histogram:
+    """Fixed-bucket histogram, optionally split by label values."""
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def collect(self):
+        for values, child in sorted(self._children.items()):
+            labels = dict(zip(self.labelnames, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+                cumulative += count
+                yield f'{self.name}_bucket', {**labels, 'le': _format_value(bound)}, cumulative
+            yield f'{self.name}_sum', labels, child.sum
+            yield f'{self.name}_count', labels, child.count
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, *values, amount: float = 1):
+        self._values[values] = self._values.get(values, 0) + amount
+
+    def collect(self):
+        for values, value in sorted(self._values.items()):
+            yield self.name, dict(zip(self.labelnames, values)), value
+
+class CallbackMetric:
+    """Counter or gauge whose value is read from another component at scrape time.
+
+    func returns either a number or a dict of label value -> number.
+    """
+    def __init__(self, name: str, documentation: str, func, type: str = 'gauge', labelname: str = None):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.type = type
+        self.labelname = labelname
+
+    def collect(self):
+        value = self.func()
+        if value is None:
+            return
+        if isinstance(value, dict):
+            for label, item in sorted(value.items()):
+                yield self.name, {self.labelname: label}, item
+        else:
+            yield self.name, {}, value
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.get(name) or self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._metrics.get(name) or self.register(Counter(name, documentation, labelnames))
+
+    def callback(self, name: str, documentation: str, func, type: str = 'gauge', labelname: str = None) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, func, type, labelname))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.collect():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram('wallet_tracker_stage_seconds', 'Time spent in each webhook pipeline stage', ('stage',))
+WEBHOOKS = registry.counter('wallet_tracker_webhooks_total', 'Webhook requests by outcome', ('outcome',))
+TRANSACTIONS_DROPPED = registry.counter('wallet_tracker_transactions_dropped_total', 'Transactions dropped before enrichment', ('reason',))
+METADATA_FETCHES = registry.counter('wallet_tracker_metadata_fetches_total', 'Off-chain metadata requests by result', ('result',))
+
+def stage(name: str) -> _Timer:
+    """Time a pipeline stage: with stage('rpc'): ..."""
+    return STAGE_SECONDS.labels(name).time()
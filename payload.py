@@ -0,0 +1,53 @@
+import logging
+
+try:
+    import orjson
+    loads = orjson.loads
+    dumps = orjson.dumps
+    JSON_BACKEND = 'orjson'
+except ImportError:
+    import json
+    loads = json.loads
+    JSON_BACKEND = 'json'
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+logger = logging.getLogger(__name__)
+
+META_FIELDS = ('err', 'fee', 'preBalances', 'postBalances', 'preTokenBalances', 'postTokenBalances')
+TOP_LEVEL_FIELDS = ('slot', 'blockTime', 'timestamp', 'accountData', 'tokenTransfers')
+
+def project_transaction(transaction: dict) -> dict:
+    """Keep only the fields the pipeline reads from a webhook transaction.
+
+    Inner instructions, log messages, instruction data and the rest of the
+    enhanced payload are dropped so they are released straight after parsing
+    instead of being held in the ingest queue.
+    """
+    tx = transaction.get('transaction') or {}
+    meta = transaction.get('meta') or {}
+    projected = {
+        'transaction': {
+            'signatures': tx.get('signatures') or [transaction.get('signature')],
+            'message': {'accountKeys': (tx.get('message') or {}).get('accountKeys') or []},
+        },
+        'meta': {field: meta[field] for field in META_FIELDS if field in meta},
+    }
+    projected['meta'].setdefault('err', None)
+    for field in TOP_LEVEL_FIELDS:
+        if field in transaction:
+            projected[field] = transaction[field]
+    return projected
+
+def decode_webhook(body: bytes) -> list:
+    """Parse a raw webhook body into a list of projected transactions.
+
+    Raises ValueError when the body is not JSON or not a list of transactions.
+    """
+    data = loads(body)
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        raise ValueError(f"Expected a list of transactions, got {type(data).__name__}")
+    return [project_transaction(transaction) for transaction in data if isinstance(transaction, dict)]
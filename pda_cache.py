@@ -0,0 +1,64 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from solders.pubkey import Pubkey # type: ignore
+from database import database
+
+logger = logging.getLogger(__name__)
+
+PDA_CACHE_SIZE = int(os.getenv('PDA_CACHE_SIZE', 20000))
+PDA_CACHE_PERSIST = os.getenv('PDA_CACHE_PERSIST', '1') == '1'
+
+TOKEN_PROGRAM = Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
+TOKEN_METADATA_PROGRAM = Pubkey.from_string("metaqbxxUerdq28cj1RbAWkYQm3ybzjb6a8bt518x1s")
+_METADATA_SEED = b"metadata"
+_METADATA_PROGRAM_BYTES = bytes(TOKEN_METADATA_PROGRAM)
+
+_pdas = OrderedDict()
+
+def _derive(mint: str) -> Pubkey:
+    return Pubkey.find_program_address([_METADATA_SEED, _METADATA_PROGRAM_BYTES, bytes(Pubkey.from_string(mint))], TOKEN_METADATA_PROGRAM)[0]
+
+def _remember(mint: str, pda: Pubkey):
+    _pdas[mint] = pda
+    if len(_pdas) > PDA_CACHE_SIZE:
+        _pdas.popitem(last=False)
+
+def metadata_pda(mint: str) -> Pubkey:
+    """Return the Metaplex metadata PDA for mint, deriving it at most once."""
+    pda = _pdas.get(mint)
+    if pda is None:
+        pda = _derive(mint)
+        _remember(mint, pda)
+    else:
+        _pdas.move_to_end(mint)
+    return pda
+
+def metadata_pdas(mints) -> list:
+    return [metadata_pda(mint) for mint in mints]
+
+async def derive_metadata_pdas(mints) -> dict:
+    """Bulk derivation for warm-up, run off the event loop."""
+    missing = [mint for mint in dict.fromkeys(mints) if mint not in _pdas]
+    if missing:
+        derived = await asyncio.to_thread(lambda: [_derive(mint) for mint in missing])
+        for mint, pda in zip(missing, derived):
+            _remember(mint, pda)
+    return {mint: _pdas[mint] for mint in mints if mint in _pdas}
+
+async def load_pda_cache():
+    """Load persisted PDAs and derive any mint seen in the metadata cache."""
+    rows = []
+    if PDA_CACHE_PERSIST:
+        rows = await database.fetchall('SELECT mint, pda FROM metadata_pdas LIMIT ?', (PDA_CACHE_SIZE,))
+    history = [row[0] for row in await database.fetchall('SELECT mint FROM token_metadata LIMIT ?', (PDA_CACHE_SIZE,))]
+    for mint, pda in rows:
+        _remember(mint, Pubkey.from_string(pda))
+    await derive_metadata_pdas(history)
+    logger.debug("PDA cache warmed with %d mints (%d persisted)", len(_pdas), len(rows))
+
+async def save_pda_cache():
+    if not PDA_CACHE_PERSIST:
+        return
+    await database.executemany('INSERT OR REPLACE INTO metadata_pdas (mint, pda) VALUES (?, ?)', [(mint, str(pda)) for mint, pda in _pdas.items()])
@@ -0,0 +1,123 @@
+import os
+import logging
+from swap_parser import index_token_balances, native_balance_change, SOL_MINT
+from metrics import TRANSACTIONS_DROPPED
+
+logger = logging.getLogger(__name__)
+
+# Default minimum native balance change for a single-token swap, overridable per guild
+PREFILTER_MIN_LAMPORTS = int(os.getenv('PREFILTER_MIN_LAMPORTS', 5000))
+
+class FailedStage:
+    """Drop transactions that failed on chain."""
+    name = 'failed'
+
+    def __call__(self, transaction, wallets, context):
+        if transaction['meta'].get('err') is not None:
+            return []
+        return wallets
+
+class TrackedStage:
+    """Intersect the account keys with the tracked wallet set."""
+    name = 'untracked'
+
+    def __init__(self, wallet_index):
+        self.wallet_index = wallet_index
+
+    def __call__(self, transaction, wallets, context):
+        return self.wallet_index.match(transaction['transaction']['message']['accountKeys'])
+
+class TokenTransferStage:
+    """Keep wallets that moved at least one token in the transaction.
+
+    Uses Helius' tokenTransfers when present and the pre/post token balances
+    otherwise. The mints each wallet touched, and the balance index when it
+    was built, are left in the context for the dust stage.
+    """
+    name = 'no_token_transfer'
+
+    def __call__(self, transaction, wallets, context):
+        moved = {wallet: set() for wallet in wallets}
+        transfers = transaction.get('tokenTransfers')
+        if transfers is not None:
+            for transfer in transfers:
+                for owner in (transfer.get('fromUserAccount'), transfer.get('toUserAccount')):
+                    if owner in moved:
+                        moved[owner].add(transfer['mint'])
+        else:
+            context['token_balances'] = index_token_balances(transaction)
+            for (owner, mint), (pre, post, _) in context['token_balances'].items():
+                if owner in moved and pre != post:
+                    moved[owner].add(mint)
+        context['token_mints'] = moved
+        return [wallet for wallet in wallets if moved[wallet]]
+
+def significant(native_change: int, token_mints: int, min_lamports: int) -> bool:
+    """A swap clears the dust threshold on its SOL side, or by trading two tokens."""
+    return abs(native_change) >= min_lamports or token_mints >= 2
+
+def swap_allowed(swap, min_lamports: int) -> bool:
+    """Apply a guild's threshold to a parsed swap before it is delivered."""
+    native_change = sum(leg.raw_amount for leg in swap.legs if leg.mint == SOL_MINT)
+    return significant(native_change, sum(1 for leg in swap.legs if leg.mint != SOL_MINT), min_lamports)
+
+class DustStage:
+    """Drop wallets whose SOL balance change, native plus WSOL, is below every subscribing guild's threshold."""
+    name = 'dust'
+
+    def __init__(self, wallet_index, guild_settings):
+        self.wallet_index = wallet_index
+        self.guild_settings = guild_settings
+
+    def min_lamports(self, wallet: str) -> int:
+        return min((self.guild_settings.min_lamports(subscriber.guild) for subscriber in self.wallet_index.get(wallet)), default=PREFILTER_MIN_LAMPORTS)
+
+    def __call__(self, transaction, wallets, context):
+        token_mints = context.get('token_mints', {})
+        balances = context.get('token_balances')
+        if balances is None:
+            balances = index_token_balances(transaction)
+        fee_payer = transaction['transaction']['message']['accountKeys'][0]
+        passed = []
+        for wallet in wallets:
+            change = native_balance_change(transaction, wallet)
+            if wallet == fee_payer:
+                change += transaction['meta'].get('fee', 0)
+            # SOL paid from or into a WSOL account counts like native SOL, as in parse_swap
+            pre, post, _ = balances.get((wallet, SOL_MINT), (0, 0, 0))
+            change += post - pre
+            mints = len(token_mints.get(wallet, set()) - {SOL_MINT})
+            if significant(change, mints, self.min_lamports(wallet)):
+                passed.append(wallet)
+        return passed
+
+class PrefilterChain:
+    """Cheap checks run on every transaction before parsing and enrichment.
+
+    Each stage takes (transaction, wallets, context) and returns the tracked
+    wallets that are still candidates (None until a stage has narrowed them
+    down); the chain stops at the first stage that leaves none and counts
+    the rejection against it.
+    """
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.passed = 0
+        self.rejected = {stage.name: 0 for stage in self.stages}
+
+    def __call__(self, transaction) -> list:
+        wallets = None
+        context = {}
+        for stage in self.stages:
+            wallets = stage(transaction, wallets, context)
+            if wallets is not None and not wallets:
+                self.rejected[stage.name] += 1
+                TRANSACTIONS_DROPPED.inc(stage.name)
+                return []
+        self.passed += 1
+        return wallets or []
+
+    def stats(self) -> dict:
+        return {"passed": self.passed, "rejected": dict(self.rejected)}
+
+def default_chain(wallet_index, guild_settings) -> PrefilterChain:
+    return PrefilterChain([FailedStage(), TrackedStage(wallet_index), TokenTransferStage(), DustStage(wallet_index, guild_settings)])
@@ -0,0 +1,414 @@
+import os
+import sys
+import time
+import signal
+import asyncio
+import logging
+import discord
+from collections import deque
+from aiohttp import web
+from dotenv import load_dotenv
+# When run as python -m receivers, the settings here and in the modules below need .env loaded first
+load_dotenv()
+from log_setup import setup_logging
+from database import database
+from http_client import http_client
+from metadata_cache import metadata_cache
+from pda_cache import load_pda_cache
+from wallet_index import wallet_index
+from guild_settings import guild_settings
+from prefilter import default_chain
+from dedup import SignatureDedup
+from swap_history import swap_row
+from ingest import IngestQueue, INGEST_MODE, RECEIVER_PROCESSES
+from payload import loads, dumps, decode_webhook
+from webhook import process_webhook, subscribers_for, build_swap_embed, swap_summary, enqueue_alerts
+from metrics import stage, WEBHOOKS, TRANSACTIONS_DROPPED
+
+logger = logging.getLogger(__name__)
+
+RECEIVER_SOCKET = os.getenv('RECEIVER_SOCKET', 'receivers.sock')
+RECEIVER_HOST = os.getenv('RECEIVER_HOST', '0.0.0.0')
+RECEIVER_PORT = int(os.getenv('RECEIVER_PORT', 5000))
+# Each receiver logs to its own file, {index} is replaced by the receiver number
+RECEIVER_LOG_FILE = os.getenv('RECEIVER_LOG_FILE', 'receiver-{index}.log')
+RECEIVER_HEALTH_INTERVAL = float(os.getenv('RECEIVER_HEALTH_INTERVAL', 5))
+RECEIVER_BUFFER = int(os.getenv('RECEIVER_BUFFER', 10000))
+RECEIVER_SHUTDOWN_TIMEOUT = float(os.getenv('RECEIVER_SHUTDOWN_TIMEOUT', 15))
+MAX_MESSAGE_SIZE = 4 * 1024 * 1024
+
+class ReceiverPool:
+    """Gateway side of the multi-process mode.
+
+    Starts one receiver process per index. Each binds the webhook port with
+    SO_REUSEPORT, so the kernel spreads connections across them, and runs
+    decoding, prefiltering, parsing and metadata enrichment off the gateway's
+    event loop. Finished swaps come back over a Unix socket, one
+    newline-delimited JSON message each; the gateway drops duplicates that
+    reached different receivers, records history and queues the embeds.
+    Receivers report health every health_interval seconds and are restarted
+    when they exit.
+    """
+    def __init__(self, bot, processes: int = RECEIVER_PROCESSES, socket_path: str = RECEIVER_SOCKET, health_interval: float = RECEIVER_HEALTH_INTERVAL):
+        self.bot = bot
+        self.processes = processes
+        self.socket_path = socket_path
+        self.health_interval = health_interval
+        self._processes = {}
+        self._writers = {}
+        self._health = {}
+        self._server = None
+        self._supervisor = None
+        self.forwarded = {}
+        self.restarts = 0
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._on_connection, self.socket_path, limit=MAX_MESSAGE_SIZE)
+        for index in range(self.processes):
+            await self._spawn(index)
+        self._supervisor = asyncio.create_task(self._supervise(), name="receiver-supervisor")
+
+    async def _spawn(self, index: int):
+        env = dict(os.environ, LOG_FILE=RECEIVER_LOG_FILE.format(index=index), RECEIVER_SOCKET=self.socket_path)
+        process = await asyncio.create_subprocess_exec(sys.executable, '-m', 'receivers', str(index), env=env)
+        self._processes[index] = process
+        logger.info("Started receiver %d (pid %d)", index, process.pid)
+
+    async def _supervise(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for index, process in list(self._processes.items()):
+                if process.returncode is not None:
+                    logger.error("Receiver %d exited with code %s, restarting", index, process.returncode)
+                    self.restarts += 1
+                    self._health.pop(index, None)
+                    await self._spawn(index)
+                elif index in self._health and not self.healthy(index):
+                    logger.warning("Receiver %d has not reported for %.0fs", index, time.monotonic() - self._health[index]['seen'])
+
+    def healthy(self, index: int) -> bool:
+        process = self._processes.get(index)
+        health = self._health.get(index)
+        return (process is not None and process.returncode is None and health is not None
+                and time.monotonic() - health['seen'] < 3 * self.health_interval)
+
+    async def _on_connection(self, reader, writer):
+        index = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = loads(line)
+                op = message.get('op')
+                if op == 'swap':
+                    self._on_swap(index, message)
+                elif op == 'health':
+                    self._health[index] = dict(message['stats'], pid=message['pid'], seen=time.monotonic())
+                elif op == 'hello':
+                    index = message['index']
+                    self._writers[index] = writer
+                    logger.debug("Receiver %d (pid %d) connected", index, message['pid'])
+        except (ConnectionError, ValueError) as e:
+            logger.warning("Dropped the connection of receiver %s: %s", index, e)
+        finally:
+            if self._writers.get(index) is writer:
+                del self._writers[index]
+            writer.close()
+
+    def _on_swap(self, index: int, message: dict):
+        if self.bot.dedup.seen(f"{message['signature']}:{message['wallet']}"):
+            TRANSACTIONS_DROPPED.inc('duplicate')
+            return
+        self.forwarded[index] = self.forwarded.get(index, 0) + 1
+        self.bot.swap_history.record_row(tuple(message['row']))
+        if message['subscribers']:
+            enqueue_alerts(self.bot.dispatcher, discord.Embed.from_dict(message['embed']), message['swapped'], message['subscribers'])
+
+    def broadcast(self, message: dict):
+        data = dumps(message) + b'\n'
+        for writer in self._writers.values():
+            writer.write(data)
+
+    def reload(self):
+        """Tell every receiver to reload the tracked wallets and guild settings."""
+        self.broadcast({"op": "reload"})
+
+    async def _stop(self, index: int, process, timeout: float):
+        if process.returncode is None:
+            process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Receiver %d did not stop within %.0fs, killing it", index, timeout)
+            process.kill()
+            await process.wait()
+
+    async def close(self, timeout: float = RECEIVER_SHUTDOWN_TIMEOUT):
+        # Receivers stop accepting, drain their queues and forward what is left before exiting
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            await asyncio.gather(self._supervisor, return_exceptions=True)
+        await asyncio.gather(*(self._stop(index, process, timeout) for index, process in self._processes.items()))
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        receivers = {}
+        for index, process in self._processes.items():
+            health = dict(self._health.get(index, {}))
+            seen = health.pop('seen', None)
+            health.update({
+                "pid": process.pid,
+                "alive": process.returncode is None,
+                "healthy": self.healthy(index),
+                "last_report": round(now - seen, 1) if seen is not None else None,
+                "forwarded": self.forwarded.get(index, 0),
+            })
+            receivers[index] = health
+        return {"processes": self.processes, "restarts": self.restarts, "receivers": receivers}
+
+class GatewayLink:
+    """Receiver end of the Unix socket to the gateway.
+
+    send() only appends to a bounded buffer, a background task writes it out
+    and reconnects with backoff, so webhooks are still acknowledged while the
+    gateway is briefly unreachable. Past max_buffer the oldest messages are
+    dropped. A batch whose write failed is sent again; the gateway drops
+    the duplicate swaps.
+    """
+    def __init__(self, index: int, on_message, socket_path: str = RECEIVER_SOCKET, max_buffer: int = RECEIVER_BUFFER):
+        self.index = index
+        self.on_message = on_message
+        self.socket_path = socket_path
+        self._buffer = deque(maxlen=max_buffer)
+        self._wake = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self.connected = False
+        self.sent = 0
+        self.dropped = 0
+        self.reconnects = 0
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run(), name="gateway-link")
+
+    def send(self, message: dict):
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(dumps(message) + b'\n')
+        self._wake.set()
+
+    def _requeue(self, batch: list):
+        pending = list(self._buffer)
+        self._buffer.clear()
+        self._buffer.extend(batch)
+        self._buffer.extend(pending)
+
+    async def _run(self):
+        delay = 0.1
+        while not self._closing or self._buffer:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path, limit=MAX_MESSAGE_SIZE)
+            except OSError as e:
+                logger.debug("Gateway socket %s not reachable: %s", self.socket_path, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5)
+                continue
+            delay = 0.1
+            self.connected = True
+            logger.info("Connected to the gateway at %s", self.socket_path)
+            reading = asyncio.create_task(self._read(reader))
+            reading.add_done_callback(lambda task: self._wake.set())
+            try:
+                writer.write(dumps({"op": "hello", "index": self.index, "pid": os.getpid()}) + b'\n')
+                await self._pump(writer, reading)
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, OSError) as e:
+                logger.warning("Lost the gateway connection: %s", e)
+            finally:
+                self.connected = False
+                reading.cancel()
+                writer.close()
+            if not self._closing:
+                self.reconnects += 1
+
+    async def _pump(self, writer, reading):
+        while not reading.done():
+            if self._buffer:
+                batch = list(self._buffer)
+                self._buffer.clear()
+                try:
+                    writer.writelines(batch)
+                    await writer.drain()
+                except BaseException:
+                    self._requeue(batch)
+                    raise
+                self.sent += len(batch)
+            elif self._closing:
+                return
+            else:
+                self._wake.clear()
+                await self._wake.wait()
+
+    async def _read(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                await self.on_message(loads(line))
+            except Exception:
+                logger.exception("Failed to handle a gateway message")
+
+    async def close(self, timeout: float = RECEIVER_SHUTDOWN_TIMEOUT):
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d messages that never reached the gateway", len(self._buffer))
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"connected": self.connected, "buffered": len(self._buffer), "sent": self.sent, "dropped": self.dropped, "reconnects": self.reconnects}
+
+class Receiver:
+    """One receiver process: the webhook endpoint and pipeline without a Discord connection.
+
+    Passed to process_webhook in place of the bot, so it carries the same
+    prefilter, wallet_index and guild_settings attributes. Swaps are
+    forwarded to the gateway instead of being sent.
+    """
+    def __init__(self, index: int):
+        self.index = index
+        self.parent = os.getppid()
+        self.link = GatewayLink(index, self.on_gateway_message)
+        self.dedup = SignatureDedup()
+        self.ingest_queue = None
+        self.runner = None
+        self._heartbeat = None
+        self._stop = asyncio.Event()
+
+    async def start(self):
+        await http_client.start()
+        await database.connect()
+        self.wallet_index = wallet_index
+        self.guild_settings = guild_settings
+        await asyncio.gather(metadata_cache.setup(), load_pda_cache(), self.wallet_index.load(), self.guild_settings.load())
+        self.prefilter = default_chain(self.wallet_index, self.guild_settings)
+        await self.link.start()
+        if INGEST_MODE == 'queue':
+            self.ingest_queue = IngestQueue(self.run_pipeline)
+            await self.ingest_queue.start()
+        app = web.Application()
+        app.add_routes([web.post('/helius-webhook', self.handle_webhook), web.get('/health', self.handle_health)])
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, RECEIVER_HOST, RECEIVER_PORT, reuse_port=True).start()
+        self._heartbeat = asyncio.create_task(self.heartbeat(), name="receiver-heartbeat")
+        logger.info("Receiver %d listening on %s:%d", self.index, RECEIVER_HOST, RECEIVER_PORT)
+
+    async def run_pipeline(self, data):
+        duplicates = self.dedup.duplicates
+        data = [transaction for transaction in data if not self.dedup.seen(transaction['transaction']['signatures'][0])]
+        if self.dedup.duplicates > duplicates:
+            TRANSACTIONS_DROPPED.inc('duplicate', amount=self.dedup.duplicates - duplicates)
+        if data:
+            await process_webhook(data, self, deliver=self.forward)
+
+    async def forward(self, swap, bot):
+        subscribers = subscribers_for(swap, self)
+        message = {"op": "swap", "signature": swap.signature, "wallet": swap.wallet, "row": swap_row(swap),
+                   "subscribers": [[subscriber.channel, subscriber.name] for subscriber in subscribers]}
+        if subscribers:
+            with stage('embed_build'):
+                message["embed"] = build_swap_embed(swap).to_dict()
+                message["swapped"] = swap_summary(swap)
+        self.link.send(message)
+
+    async def handle_webhook(self, request):
+        body = await request.read()
+        try:
+            with stage('json_decode'):
+                data = decode_webhook(body)
+        except ValueError as e:
+            WEBHOOKS.inc('invalid')
+            logger.warning("Rejected malformed webhook body (%d bytes): %s", len(body), e)
+            return web.Response(status=400, text="Invalid payload")
+        if self.ingest_queue is None:
+            await self.run_pipeline(data)
+            WEBHOOKS.inc('processed')
+            return web.Response(text="Webhook received")
+        if not self.ingest_queue.submit(data):
+            WEBHOOKS.inc('rejected')
+            logger.warning("Ingest queue full (%d), rejecting webhook", self.ingest_queue.depth)
+            return web.Response(status=503, text="Queue full", headers={"Retry-After": "1"})
+        WEBHOOKS.inc('accepted')
+        return web.Response(text="Webhook queued", headers={"X-Queue-Depth": str(self.ingest_queue.depth)})
+
+    async def handle_health(self, request):
+        return web.json_response(dict(self.stats(), receiver=self.index), status=200 if self.link.connected else 503)
+
+    async def on_gateway_message(self, message: dict):
+        if message.get('op') == 'reload':
+            await self.wallet_index.load()
+            await self.guild_settings.load()
+
+    async def heartbeat(self):
+        while True:
+            if os.getppid() != self.parent:
+                logger.error("Gateway process is gone, shutting down")
+                self._stop.set()
+                return
+            self.link.send({"op": "health", "pid": os.getpid(), "stats": self.stats()})
+            await asyncio.sleep(RECEIVER_HEALTH_INTERVAL)
+
+    def stats(self) -> dict:
+        return {
+            "webhooks": {labels['outcome']: value for _, labels, value in WEBHOOKS.collect()},
+            "queue": self.ingest_queue.stats() if self.ingest_queue is not None else None,
+            "dedup": self.dedup.stats(),
+            "prefilter": self.prefilter.stats(),
+            "link": self.link.stats(),
+        }
+
+    async def run(self):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self._stop.set)
+        try:
+            await self.start()
+            await self._stop.wait()
+        finally:
+            await self.close()
+
+    async def close(self):
+        # Stop accepting first, then let queued webhooks finish and reach the gateway
+        if self.runner is not None:
+            await self.runner.cleanup()
+        if self.ingest_queue is not None:
+            await self.ingest_queue.close()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+        await self.link.close()
+        await database.close()
+        await http_client.close()
+        logger.info("Receiver %d stopped", self.index)
+
+if __name__ == '__main__':
+    # Ctrl+C reaches the whole process group; the gateway stops receivers with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # LOG_FILE is set per receiver by ReceiverPool
+    setup_logging()
+    asyncio.run(Receiver(int(sys.argv[1])).run())
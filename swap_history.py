@@ -0,0 +1,157 @@
+import os
+import asyncio
+import logging
+from collections import deque
+from database import database
+from swap_parser import SOL_MINT
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', 2))
+HISTORY_BATCH_SIZE = int(os.getenv('HISTORY_BATCH_SIZE', 500))
+HISTORY_MAX_BUFFER = int(os.getenv('HISTORY_MAX_BUFFER', 50000))
+
+COLUMNS = 'signature, address, block_time, slot, mint, out_mint, out_amount, out_symbol, in_mint, in_amount, in_symbol'
+
+def swap_row(swap) -> tuple:
+    token_out, token_in = swap.token_out, swap.token_in
+    # The token a swap is filed under: whichever primary leg is not SOL
+    mint = token_in.mint if token_in.mint != SOL_MINT else token_out.mint
+    return (swap.signature, swap.wallet, swap.block_time, swap.slot, mint,
+            token_out.mint, token_out.amount, token_out.symbol, token_in.mint, token_in.amount, token_in.symbol)
+
+class SwapHistory:
+    """Write-behind store of every parsed swap.
+
+    record() only appends to an in-memory buffer, so the alert path never
+    waits on SQLite. A background task writes the buffer with one
+    executemany transaction every flush_interval seconds, or as soon as
+    batch_size rows are waiting. If the database falls behind, the oldest
+    buffered rows beyond max_buffer are dropped.
+    """
+    def __init__(self, flush_interval: float = HISTORY_FLUSH_INTERVAL, batch_size: int = HISTORY_BATCH_SIZE, max_buffer: int = HISTORY_MAX_BUFFER):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._buffer = deque(maxlen=max_buffer)
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run(), name="swap-history")
+
+    def record(self, swap):
+        self.record_row(swap_row(swap))
+
+    def record_row(self, row: tuple):
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._buffer:
+                return
+            rows = list(self._buffer)
+            self._buffer.clear()
+            try:
+                await database.executemany(f'INSERT OR IGNORE INTO swap_history ({COLUMNS}) VALUES ({", ".join("?" * 11)})', rows)
+            except Exception as e:
+                logger.error("Failed to write %d swaps to history: %s", len(rows), e)
+                # Put them back in front of anything recorded meanwhile; past
+                # max_buffer the deque discards the oldest rows
+                recorded = list(self._buffer)
+                self._buffer.clear()
+                self._buffer.extend(rows)
+                self._buffer.extend(recorded)
+                return
+            self.written += len(rows)
+            self.flushes += 1
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self.flush()
+
+    async def wallet_stats(self, address: str, since: int) -> dict:
+        swaps, buys, sol_spent, sells, sol_received, tokens = await database.fetchone('''SELECT COUNT(*),
+                SUM(out_mint = ?), SUM(CASE WHEN out_mint = ? THEN out_amount ELSE 0 END),
+                SUM(in_mint = ?), SUM(CASE WHEN in_mint = ? THEN in_amount ELSE 0 END),
+                COUNT(DISTINCT mint)
+            FROM swap_history WHERE address = ? AND block_time >= ?''', (SOL_MINT, SOL_MINT, SOL_MINT, SOL_MINT, address, since))
+        top = await database.fetchall('''SELECT mint, MAX(CASE WHEN in_mint = mint THEN in_symbol ELSE out_symbol END), COUNT(*)
+            FROM swap_history WHERE address = ? AND block_time >= ?
+            GROUP BY mint ORDER BY COUNT(*) DESC LIMIT 5''', (address, since))
+        return {"swaps": swaps, "buys": buys or 0, "sol_spent": sol_spent or 0.0, "sells": sells or 0,
+                "sol_received": sol_received or 0.0, "tokens": tokens, "top": top}
+
+    async def mint_stats(self, mint: str, since: int, addresses) -> list:
+        """(address, buys, sells) for the given wallets that traded mint since since."""
+        rows = await database.fetchall('''SELECT address, SUM(in_mint = mint), SUM(out_mint = mint)
+            FROM swap_history WHERE mint = ? AND block_time >= ?
+            GROUP BY address ORDER BY COUNT(*) DESC''', (mint, since))
+        return [row for row in rows if row[0] in addresses]
+
+    def stats(self) -> dict:
+        return {"buffered": len(self._buffer), "written": self.written, "dropped": self.dropped, "flushes": self.flushes}
+
+class HistoryPages:
+    """Keyset-paginated view of one wallet's swaps, newest first.
+
+    Works like WalletPages: pages are cached, neighbouring pages are read
+    with (block_time, rowid) keyset queries on the (address, block_time)
+    index and only jumps to an unvisited page use OFFSET.
+    """
+    def __init__(self, address: str, since: int, per_page: int = 10):
+        self.address = address
+        self.since = since
+        self.per_page = per_page
+        self._count = None
+        self._pages = {}
+
+    async def count(self) -> int:
+        if self._count is None:
+            row = await database.fetchone('SELECT COUNT(*) FROM swap_history WHERE address = ? AND block_time >= ?', (self.address, self.since))
+            self._count = row[0]
+        return self._count
+
+    async def total_pages(self) -> int:
+        return max(1, ((await self.count()) - 1) // self.per_page + 1)
+
+    async def page(self, index: int) -> list:
+        """Return (block_time, rowid, signature, out_amount, out_symbol, in_amount, in_symbol) rows on page index (1-based)."""
+        rows = self._pages.get(index)
+        if rows is not None:
+            return rows
+        select = 'SELECT block_time, rowid, signature, out_amount, out_symbol, in_amount, in_symbol FROM swap_history WHERE address = ? AND block_time >= ?'
+        if self._pages.get(index - 1):
+            last = self._pages[index - 1][-1]
+            query = f'{select} AND (block_time, rowid) < (?, ?) ORDER BY block_time DESC, rowid DESC LIMIT ?'
+            params = (self.address, self.since, last[0], last[1], self.per_page)
+        elif self._pages.get(index + 1):
+            first = self._pages[index + 1][0]
+            query = f'SELECT * FROM ({select} AND (block_time, rowid) > (?, ?) ORDER BY block_time, rowid LIMIT ?) ORDER BY block_time DESC, rowid DESC'
+            params = (self.address, self.since, first[0], first[1], self.per_page)
+        else:
+            query = f'{select} ORDER BY block_time DESC, rowid DESC LIMIT ? OFFSET ?'
+            params = (self.address, self.since, self.per_page, (index - 1) * self.per_page)
+        rows = await database.fetchall(query, params)
+        self._pages[index] = rows
+        return rows
+
+swap_history = SwapHistory()
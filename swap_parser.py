@@ -0,0 +1,133 @@
+import os
+import time
+
+SOL_MINT = 'So11111111111111111111111111111111111111112'
+SOL_DECIMALS = 9
+SOL_LOGO = 'https://raw.githubusercontent.com/solana-labs/token-list/main/assets/mainnet/So11111111111111111111111111111111111111112/logo.png'
+SOL_METADATA = ('Wrapped SOL', 'SOL', SOL_LOGO, None, None, None, None)
+# Native SOL moves below this many lamports (ATA rent, priority fees) are not
+# reported as a swap leg when a token leg already covers that side
+SOL_DUST_LAMPORTS = int(os.getenv('SOL_DUST_LAMPORTS', 5_000_000))
+
+class TokenLeg:
+    """One side of a swap: a mint and the wallet's raw balance change."""
+    __slots__ = ('mint', 'raw_amount', 'decimals', 'metadata')
+
+    def __init__(self, mint: str, raw_amount: int, decimals: int, metadata: tuple = None):
+        self.mint = mint
+        self.raw_amount = raw_amount
+        self.decimals = decimals
+        self.metadata = metadata
+
+    @property
+    def amount(self) -> float:
+        return abs(self.raw_amount) / 10 ** self.decimals
+
+    @property
+    def symbol(self):
+        return self.metadata[1] if self.metadata else None
+
+    @property
+    def logo(self) -> str:
+        return self.metadata[2] if self.metadata and self.metadata[2] else ""
+
+    def __repr__(self):
+        return f"TokenLeg({self.mint!r}, {self.raw_amount}, {self.decimals})"
+
+class SwapResult:
+    """Tokens a wallet sent and received in a transaction.
+
+    sent and received are ordered by size, so sent[0] and received[0] are the
+    primary legs shown in alerts. Routed swaps simply have more legs.
+    """
+    __slots__ = ('wallet', 'signature', 'slot', 'sent', 'received', 'block_time')
+
+    def __init__(self, wallet: str, signature: str, slot: int, sent: list, received: list, block_time: int = None):
+        self.wallet = wallet
+        self.signature = signature
+        self.slot = slot
+        self.sent = sent
+        self.received = received
+        self.block_time = block_time if block_time is not None else int(time.time())
+
+    @property
+    def token_out(self) -> TokenLeg:
+        return self.sent[0]
+
+    @property
+    def token_in(self) -> TokenLeg:
+        return self.received[0]
+
+    @property
+    def legs(self) -> list:
+        return self.sent + self.received
+
+    @property
+    def mints(self) -> list:
+        return [leg.mint for leg in self.legs if leg.mint != SOL_MINT]
+
+    def __repr__(self):
+        return f"SwapResult({self.wallet!r}, {self.signature!r}, sent={self.sent}, received={self.received})"
+
+def index_token_balances(transaction) -> dict:
+    """Map (owner, mint) -> [pre, post, decimals] in raw token units.
+
+    Keyed by owner rather than list position, so token accounts created or
+    closed by the transaction still produce the right delta.
+    """
+    index = {}
+    meta = transaction['meta']
+    for position, balances in ((0, meta.get('preTokenBalances') or ()), (1, meta.get('postTokenBalances') or ())):
+        for balance in balances:
+            amount = balance['uiTokenAmount']
+            key = (balance.get('owner'), balance['mint'])
+            entry = index.get(key)
+            if entry is None:
+                entry = index[key] = [0, 0, amount['decimals']]
+            entry[position] += int(amount['amount'])
+    return index
+
+def native_balance_change(transaction, wallet: str) -> int:
+    for account in transaction.get('accountData') or ():
+        if account['account'] == wallet:
+            return account['nativeBalanceChange']
+    # Plain RPC transactions have no accountData, fall back to the balance arrays
+    account_keys = transaction['transaction']['message']['accountKeys']
+    for i, key in enumerate(account_keys):
+        if key == wallet:
+            return transaction['meta']['postBalances'][i] - transaction['meta']['preBalances'][i]
+    return 0
+
+def parse_swap(transaction, wallet: str, index: dict = None):
+    """Return the SwapResult for wallet, or None if it did not swap."""
+    if index is None:
+        index = index_token_balances(transaction)
+    sent = []
+    received = []
+    sol_change = native_balance_change(transaction, wallet)
+    if transaction['transaction']['message']['accountKeys'][0] == wallet:
+        # The fee payer's native change includes the network fee
+        sol_change += transaction['meta'].get('fee', 0)
+
+    for (owner, mint), (pre, post, decimals) in index.items():
+        if owner != wallet or pre == post:
+            continue
+        if mint == SOL_MINT:
+            sol_change += post - pre
+        elif post > pre:
+            received.append(TokenLeg(mint, post - pre, decimals))
+        else:
+            sent.append(TokenLeg(mint, post - pre, decimals))
+
+    if sol_change < 0 and (not sent or -sol_change >= SOL_DUST_LAMPORTS):
+        sent.append(TokenLeg(SOL_MINT, sol_change, SOL_DECIMALS, SOL_METADATA))
+    elif sol_change > 0 and (not received or sol_change >= SOL_DUST_LAMPORTS):
+        received.append(TokenLeg(SOL_MINT, sol_change, SOL_DECIMALS, SOL_METADATA))
+
+    if not sent or not received:
+        return None
+    sent.sort(key=lambda leg: leg.amount, reverse=True)
+    received.sort(key=lambda leg: leg.amount, reverse=True)
+    # Raw and RPC transactions carry blockTime, enhanced webhooks timestamp
+    block_time = transaction.get('blockTime') or transaction.get('timestamp')
+    return SwapResult(wallet, transaction['transaction']['signatures'][0], transaction.get('slot', 0), sent, received, block_time)
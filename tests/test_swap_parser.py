@@ -0,0 +1,118 @@
+"""parse_swap on hand-built RPC transactions.
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from swap_parser import parse_swap, index_token_balances, SOL_MINT, SOL_DUST_LAMPORTS  # noqa: E402
+
+WALLET = 'Wallet111111111111111111111111111111111111'
+POOL = 'Pool1111111111111111111111111111111111111111'
+MINT_A = 'MintA111111111111111111111111111111111111111'
+MINT_B = 'MintB111111111111111111111111111111111111111'
+MINT_C = 'MintC111111111111111111111111111111111111111'
+ROUTE = 'Route11111111111111111111111111111111111111'
+FEE = 5000
+
+def balance(owner, mint, amount, decimals=6):
+    return {'owner': owner, 'mint': mint, 'uiTokenAmount': {'amount': str(amount), 'decimals': decimals}}
+
+def transaction(native_change=0, pre_tokens=(), post_tokens=(), fee_payer=WALLET):
+    """An RPC-shaped transaction where WALLET's native balance moves by native_change."""
+    keys = [WALLET, POOL] if fee_payer == WALLET else [fee_payer, WALLET]
+    pre = [10 ** 10, 10 ** 10]
+    post = list(pre)
+    post[keys.index(WALLET)] += native_change
+    return {
+        'slot': 1,
+        'blockTime': 1700000000,
+        'transaction': {'signatures': ['sig'], 'message': {'accountKeys': keys}},
+        'meta': {'err': None, 'fee': FEE, 'preBalances': pre, 'postBalances': post,
+                 'preTokenBalances': list(pre_tokens), 'postTokenBalances': list(post_tokens)},
+    }
+
+def legs(swap_legs):
+    return [(leg.mint, leg.raw_amount) for leg in swap_legs]
+
+class ParseSwapTest(unittest.TestCase):
+    def test_created_token_account(self):
+        # The token account only exists after the transaction, so it has no pre balance
+        tx = transaction(native_change=-10 ** 9 - FEE, post_tokens=[balance(WALLET, MINT_A, 500)])
+        swap = parse_swap(tx, WALLET)
+        self.assertEqual(legs(swap.sent), [(SOL_MINT, -10 ** 9)])
+        self.assertEqual(legs(swap.received), [(MINT_A, 500)])
+
+    def test_closed_token_account(self):
+        # Selling the whole balance closes the account, so it has no post balance
+        tx = transaction(native_change=5 * 10 ** 8 - FEE, pre_tokens=[balance(WALLET, MINT_A, 500)])
+        swap = parse_swap(tx, WALLET)
+        self.assertEqual(legs(swap.sent), [(MINT_A, -500)])
+        self.assertEqual(legs(swap.received), [(SOL_MINT, 5 * 10 ** 8)])
+
+    def test_wsol_funded_buy(self):
+        # Only the fee leaves the native balance, the 2 SOL come out of a WSOL account
+        tx = transaction(native_change=-FEE,
+                         pre_tokens=[balance(WALLET, SOL_MINT, 3 * 10 ** 9, 9), balance(WALLET, MINT_A, 0)],
+                         post_tokens=[balance(WALLET, SOL_MINT, 10 ** 9, 9), balance(WALLET, MINT_A, 700)])
+        swap = parse_swap(tx, WALLET)
+        self.assertEqual(legs(swap.sent), [(SOL_MINT, -2 * 10 ** 9)])
+        self.assertEqual(legs(swap.received), [(MINT_A, 700)])
+        self.assertEqual(swap.mints, [MINT_A])
+
+    def test_fee_is_only_added_back_for_the_fee_payer(self):
+        tx = transaction(native_change=-10 ** 9, post_tokens=[balance(WALLET, MINT_A, 500)], fee_payer=ROUTE)
+        swap = parse_swap(tx, WALLET)
+        self.assertEqual(legs(swap.sent), [(SOL_MINT, -10 ** 9)])
+
+    def test_routed_multi_leg_swap(self):
+        # The route passes through MINT_B, whose balance ends where it started, and pays out in two tokens
+        tx = transaction(native_change=-10 ** 9 - FEE,
+                         pre_tokens=[balance(WALLET, MINT_B, 40), balance(WALLET, MINT_C, 0, 9)],
+                         post_tokens=[balance(WALLET, MINT_B, 40), balance(WALLET, MINT_A, 300), balance(WALLET, MINT_C, 5 * 10 ** 9, 9),
+                                      balance(POOL, MINT_A, 10 ** 6)])
+        swap = parse_swap(tx, WALLET)
+        self.assertEqual(legs(swap.sent), [(SOL_MINT, -10 ** 9)])
+        # Ordered by UI amount: 5 MINT_C before 0.0003 MINT_A
+        self.assertEqual(legs(swap.received), [(MINT_C, 5 * 10 ** 9), (MINT_A, 300)])
+        self.assertEqual(swap.token_in.mint, MINT_C)
+
+    def test_token_accounts_of_one_owner_are_summed(self):
+        tx = transaction(pre_tokens=[balance(WALLET, MINT_A, 100), balance(WALLET, MINT_A, 50)],
+                         post_tokens=[balance(WALLET, MINT_A, 20)])
+        self.assertEqual(index_token_balances(tx)[(WALLET, MINT_A)], [150, 20, 6])
+
+    def test_sol_dust_is_suppressed_next_to_a_token_leg(self):
+        # Rent for the new MINT_B account is not a SOL leg of a token-to-token swap
+        rent = -2_039_280
+        self.assertLess(-rent, SOL_DUST_LAMPORTS)
+        tx = transaction(native_change=rent - FEE,
+                         pre_tokens=[balance(WALLET, MINT_A, 500)],
+                         post_tokens=[balance(WALLET, MINT_A, 0), balance(WALLET, MINT_B, 900)])
+        swap = parse_swap(tx, WALLET)
+        self.assertEqual(legs(swap.sent), [(MINT_A, -500)])
+        self.assertEqual(legs(swap.received), [(MINT_B, 900)])
+
+    def test_sol_above_dust_is_kept_next_to_a_token_leg(self):
+        tx = transaction(native_change=-SOL_DUST_LAMPORTS - FEE,
+                         pre_tokens=[balance(WALLET, MINT_A, 500)],
+                         post_tokens=[balance(WALLET, MINT_A, 0), balance(WALLET, MINT_B, 900)])
+        swap = parse_swap(tx, WALLET)
+        # Ordered by UI amount: 0.005 SOL before 0.0005 MINT_A
+        self.assertEqual(legs(swap.sent), [(SOL_MINT, -SOL_DUST_LAMPORTS), (MINT_A, -500)])
+
+    def test_dust_alone_is_still_a_leg(self):
+        # With no token on the sending side even a small SOL amount is the swap's input
+        tx = transaction(native_change=-10 ** 6 - FEE, post_tokens=[balance(WALLET, MINT_A, 500)])
+        swap = parse_swap(tx, WALLET)
+        self.assertEqual(legs(swap.sent), [(SOL_MINT, -10 ** 6)])
+
+    def test_transfer_without_a_counter_leg_is_not_a_swap(self):
+        tx = transaction(native_change=-FEE, pre_tokens=[balance(WALLET, MINT_A, 500)], post_tokens=[balance(WALLET, MINT_A, 0)])
+        self.assertIsNone(parse_swap(tx, WALLET))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""WebhookSync against the Helius webhook admin API served by benchmarks/stubs.py.
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from stubs import UpstreamStub  # noqa: E402
+from http_client import http_client  # noqa: E402
+from database import database, DB_PATH  # noqa: E402
+from webhook_sync import WebhookSync  # noqa: E402
+
+DEBOUNCE = 0.05
+
+class WebhookSyncTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.stub = UpstreamStub(webhook_addresses=['stale'])
+        await self.stub.start()
+        await http_client.start()
+        self.sync = WebhookSync(self.stub.webhook_url(), api_key='test', debounce=DEBOUNCE)
+
+    async def asyncTearDown(self):
+        await self.sync.close()
+        await http_client.close()
+        await self.stub.close()
+
+    async def settle(self):
+        # Wait for the debounced flush, including any retry it schedules
+        while self.sync._flush_task is not None and not self.sync._flush_task.done():
+            await asyncio.sleep(DEBOUNCE)
+
+    def remote(self) -> set:
+        return set(self.stub.webhook['accountAddresses'])
+
+    def puts(self) -> int:
+        return self.stub.calls.get('webhook_put', 0)
+
+    async def test_debounce_coalesces_changes_into_one_put(self):
+        self.sync.addresses = {'stale'}
+        for address in ('a', 'b', 'c'):
+            self.sync.add(address)
+        self.sync.remove('b', 'stale')
+        await self.settle()
+        self.assertEqual(self.puts(), 1)
+        self.assertEqual(self.remote(), {'a', 'c'})
+        self.assertEqual(self.sync.pending, 0)
+
+    async def test_concurrent_add_and_remove(self):
+        async def add(address):
+            await asyncio.sleep(0)
+            self.sync.add(address)
+
+        async def remove(address):
+            await asyncio.sleep(0)
+            self.sync.remove(address)
+
+        await asyncio.gather(*(add(f"wallet{i}") for i in range(50)), *(remove(f"wallet{i}") for i in range(0, 50, 2)))
+        # A change made while a PUT is in flight is flushed by a later PUT, not lost
+        flushing = asyncio.create_task(self.sync.flush())
+        await asyncio.sleep(0)
+        self.sync.add('late')
+        self.sync.remove('wallet1')
+        await flushing
+        await self.settle()
+        expected = {f"wallet{i}" for i in range(3, 50, 2)} | {'late'}
+        self.assertEqual(self.sync.addresses, expected)
+        self.assertEqual(self.remote(), expected)
+        self.assertLessEqual(self.puts(), 3)
+
+    async def test_failed_put_is_retried(self):
+        self.stub.webhook_put_failures = 1
+        self.sync.add('a')
+        await self.settle()
+        self.assertEqual(self.sync.failures, 1)
+        self.assertEqual(self.sync.flushes, 1)
+        self.assertEqual(self.puts(), 2)
+        self.assertEqual(self.remote(), {'a'})
+
+    async def test_repeated_failures_back_off(self):
+        self.sync.max_backoff = DEBOUNCE * 3
+        self.stub.webhook_put_failures = 3
+        self.sync.add('a')
+        delays = []
+        while self.puts() < 3:
+            await asyncio.sleep(DEBOUNCE / 5)
+            delays.append(self.sync.retry_delay())
+        # 0.05, then 0.1, then 0.2 capped at 0.15
+        self.assertEqual(max(delays), DEBOUNCE * 3)
+        await self.settle()
+        self.assertEqual(self.puts(), 4)
+        self.assertEqual(self.sync.consecutive_failures, 0)
+        self.assertEqual(self.sync.retry_delay(), DEBOUNCE)
+        self.assertEqual(self.remote(), {'a'})
+
+    async def test_startup_reconcile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database.path = os.path.join(directory, 'test.db')
+            await database.connect()
+            try:
+                await database.executemany('INSERT INTO wallets (name, address, guild, channel) VALUES (?, ?, ?, ?)',
+                                           [('one', 'a', 1, 10), ('two', 'b', 1, 10), ('again', 'a', 2, 20)])
+                await self.sync.load()
+            finally:
+                await database.close()
+                database.path = DB_PATH
+        self.assertEqual(self.sync.addresses, {'a', 'b'})
+        self.assertTrue(await self.sync.reconcile())
+        self.assertEqual(self.remote(), {'a', 'b'})
+        self.assertEqual(self.puts(), 1)
+        # Already in sync, nothing to push
+        self.assertTrue(await self.sync.reconcile())
+        self.assertEqual(self.puts(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
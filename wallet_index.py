@@ -0,0 +1,56 @@
+import logging
+from database import database
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+Subscriber = namedtuple('Subscriber', ['guild', 'channel', 'name'])
+
+class WalletIndex:
+    """In-memory map of tracked address -> subscribers.
+
+    Built from main.db at startup and kept up to date by the /tracker
+    commands, so matching a transaction's accountKeys needs no database I/O.
+    """
+    def __init__(self):
+        self._subscribers = {}
+
+    async def load(self):
+        rows = await database.fetchall('SELECT name, address, guild, channel FROM wallets')
+        subscribers = {}
+        for name, address, guild, channel in rows:
+            subscribers.setdefault(address, []).append(Subscriber(guild, channel, name))
+        self._subscribers = subscribers
+        logger.debug("Loaded %d tracked wallets for %d addresses", len(rows), len(subscribers))
+
+    def add(self, address: str, guild: int, channel: int, name: str):
+        entries = [s for s in self._subscribers.get(address, []) if s.guild != guild]
+        entries.append(Subscriber(guild, channel, name))
+        self._subscribers[address] = entries
+
+    def remove(self, address: str, guild: int):
+        entries = [s for s in self._subscribers.get(address, []) if s.guild != guild]
+        if entries:
+            self._subscribers[address] = entries
+        else:
+            self._subscribers.pop(address, None)
+
+    def get(self, address: str) -> list:
+        return self._subscribers.get(address, [])
+
+    def match(self, account_keys) -> list:
+        """Return the tracked addresses in account_keys, in their original order."""
+        subscribers = self._subscribers
+        return [address for address in account_keys if address in subscribers]
+
+    def is_tracked(self, address: str) -> bool:
+        return address in self._subscribers
+
+    @property
+    def addresses(self):
+        return self._subscribers.keys()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+wallet_index = WalletIndex()
@@ -0,0 +1,42 @@
+from database import database
+
+class WalletPages:
+    """Keyset-paginated view of one guild's tracked wallets.
+
+    Lives as long as the paginator that uses it. The row count is queried
+    once, every page is cached after its first fetch, and neighbouring pages
+    are read with rowid keyset queries on the (guild, rowid) index, so next
+    and previous flips cost the same regardless of how many wallets a guild
+    tracks. Jumps to an unvisited page fall back to a single OFFSET query.
+    """
+    def __init__(self, guild_id: int, per_page: int = 5):
+        self.guild_id = guild_id
+        self.per_page = per_page
+        self._count = None
+        self._pages = {}
+
+    async def count(self) -> int:
+        if self._count is None:
+            self._count = (await database.fetchone('SELECT COUNT(*) FROM wallets WHERE guild = ?', (self.guild_id,)))[0]
+        return self._count
+
+    async def total_pages(self) -> int:
+        return max(1, ((await self.count()) - 1) // self.per_page + 1)
+
+    async def page(self, index: int) -> list:
+        """Return the (rowid, name, address) rows on page index (1-based)."""
+        rows = self._pages.get(index)
+        if rows is not None:
+            return rows
+        if index - 1 in self._pages and self._pages[index - 1]:
+            query = 'SELECT rowid, name, address FROM wallets WHERE guild = ? AND rowid > ? ORDER BY rowid LIMIT ?'
+            params = (self.guild_id, self._pages[index - 1][-1][0], self.per_page)
+        elif index + 1 in self._pages and self._pages[index + 1]:
+            query = 'SELECT * FROM (SELECT rowid, name, address FROM wallets WHERE guild = ? AND rowid < ? ORDER BY rowid DESC LIMIT ?) ORDER BY rowid'
+            params = (self.guild_id, self._pages[index + 1][0][0], self.per_page)
+        else:
+            query = 'SELECT rowid, name, address FROM wallets WHERE guild = ? ORDER BY rowid LIMIT ? OFFSET ?'
+            params = (self.guild_id, self.per_page, (index - 1) * self.per_page)
+        rows = await database.fetchall(query, params)
+        self._pages[index] = rows
+        return rows
@@ -1,20 +1,38 @@
 import discord
 import os
-import base58
-import base64
-import struct
-from solders.pubkey import Pubkey
+import asyncio
+import copy
+import time
 import datetime
 import logging
 import aiohttp
-import aiosqlite
-from main import bot
+from urllib.parse import urlsplit
+from metadata_cache import metadata_cache, MISSING
+from http_client import get_session
+from metadata_decoder import MetadataAccount, decode_metadata_accounts
+from pda_cache import metadata_pdas
+from swap_parser import parse_swap, index_token_balances, SOL_MINT
+from prefilter import swap_allowed
+from metrics import stage, METADATA_FETCHES, TRANSACTIONS_DROPPED
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
 
 API_KEY = os.getenv('HELIUS_KEY')
-url = f"https://mainnet.helius-rpc.com/?api-key={API_KEY}"
+url = os.getenv('SOLANA_RPC_URL', f"https://mainnet.helius-rpc.com/?api-key={API_KEY}")
+MAX_MULTIPLE_ACCOUNTS = 100
+# Off-chain metadata fetches run at once per resolved batch
+TX_CONCURRENCY = int(os.getenv('TX_CONCURRENCY', 8))
+EMPTY_METADATA = (None, None, None, None, None, None, None)
+IPFS_GATEWAYS = [gateway.strip() for gateway in os.getenv('IPFS_GATEWAYS', 'https://ipfs.io/ipfs/,https://cloudflare-ipfs.com/ipfs/,https://gateway.pinata.cloud/ipfs/').split(',') if gateway.strip()]
+METADATA_TIMEOUT = float(os.getenv('METADATA_TIMEOUT', 3))
+# Start the next gateway if the current one has not answered within this many seconds
+METADATA_HEDGE_DELAY = float(os.getenv('METADATA_HEDGE_DELAY', 0.25))
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', 5))
+BREAKER_RESET = float(os.getenv('BREAKER_RESET', 30))
+
+# mint -> future shared by every concurrent lookup of that mint
+_inflight = {}
+_breakers = {}
 
 async def get_accountInfo(pubkey):
     pubkey = str(pubkey)
@@ -28,296 +46,386 @@ async def get_accountInfo(pubkey):
             {"commitment": "confirmed", "encoding": "base64"}
         ]
     }
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, json=payload, headers=headers) as response:
+    async with get_session().post(url, json=payload, headers=headers) as response:
+        json_response = await response.json()
+        if json_response.get('error') is not None:
+            error = json_response.get('error').get('code')
+            if error == -32602:
+                return 'Invalid address'
+            else:
+                return 'Unknown error'
+        elif json_response.get('error') is None:
+            return json_response
+
+async def get_multipleAccounts(pubkeys):
+    # getMultipleAccounts accepts at most 100 keys per request
+    pubkeys = [str(pubkey) for pubkey in pubkeys]
+    headers = {"Content-Type": "application/json"}
+    accounts = []
+    for start in range(0, len(pubkeys), MAX_MULTIPLE_ACCOUNTS):
+        payload = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "getMultipleAccounts",
+            "params": [
+                pubkeys[start:start + MAX_MULTIPLE_ACCOUNTS],
+                {"commitment": "confirmed", "encoding": "base64"}
+            ]
+        }
+        async with get_session().post(url, json=payload, headers=headers) as response:
             json_response = await response.json()
-            if json_response.get('error') is not None:
-                error = json_response.get('error').get('code')
-                if error == -32602:
-                    return 'Invalid address'
-                else:
-                    return 'Unknown error'
-            elif json_response.get('error') is None:
-                return json_response
+        if json_response.get('error') is not None:
+            raise ValueError(f"getMultipleAccounts failed: {json_response.get('error')}")
+        accounts.extend(json_response['result']['value'])
+    return accounts
 
 def unpack_metadata_account(data):
-    assert(data[0] == 4)
-    i = 1
-    source_account = base58.b58encode(bytes(struct.unpack('<' + "B"*32, data[i:i+32]))).decode('utf-8')
-    i += 32
-    mint_account = base58.b58encode(bytes(struct.unpack('<' + "B"*32, data[i:i+32]))).decode('utf-8')
-    i += 32
-    name_len = struct.unpack('<I', data[i:i+4])[0]
-    i += 4
-    name = struct.unpack('<' + "B"*name_len, data[i:i+name_len])
-    i += name_len
-    symbol_len = struct.unpack('<I', data[i:i+4])[0]
-    i += 4 
-    symbol = struct.unpack('<' + "B"*symbol_len, data[i:i+symbol_len])
-    i += symbol_len
-    uri_len = struct.unpack('<I', data[i:i+4])[0]
-    i += 4 
-    uri = struct.unpack('<' + "B"*uri_len, data[i:i+uri_len])
-    i += uri_len
-    fee = struct.unpack('<h', data[i:i+2])[0]
-    i += 2
-    has_creator = data[i] 
-    i += 1
-    creators = []
-    verified = []
-    share = []
-    if has_creator:
-        creator_len = struct.unpack('<I', data[i:i+4])[0]
-        i += 4
-        for _ in range(creator_len):
-            creator = base58.b58encode(bytes(struct.unpack('<' + "B"*32, data[i:i+32])))
-            creators.append(creator)
-            i += 32
-            verified.append(data[i])
-            i += 1
-            share.append(data[i])
-            i += 1
-    primary_sale_happened = bool(data[i])
-    i += 1
-    is_mutable = bool(data[i])
-    metadata = {
-        "update_authority": source_account,
-        "mint": mint_account,
-        "data": {
-            "name": bytes(name).decode("utf-8").strip("\x00"),
-            "symbol": bytes(symbol).decode("utf-8").strip("\x00"),
-            "uri": bytes(uri).decode("utf-8").strip("\x00"),
-            "seller_fee_basis_points": fee,
-            "creators": creators,
-            "verified": verified,
-            "share": share,
-        },
-        "primary_sale_happened": primary_sale_happened,
-        "is_mutable": is_mutable,
-    }
-    return metadata
+    return MetadataAccount(data).to_dict()
 
 async def get_metaData(ca):
+    return (await get_metaData_batch([ca]))[ca]
+
+async def get_metaData_batch(mints):
+    """Resolve metadata for several mints with a single getMultipleAccounts call.
+
+    Cached mints are served without any network calls. A mint that another
+    task is already resolving is awaited instead of fetched again. The rest
+    are fetched in one RPC round trip and their off-chain JSON concurrently.
+    Returns a dict of mint -> metadata tuple.
+    """
+    results = {}
+    pending = {}
+    waiting = {}
+    resolved = {}
+    # Every future registered in _inflight is resolved and removed in the finally,
+    # even if a later cache lookup fails, so other lookups never wait on it forever
+    try:
+        for ca in dict.fromkeys(mints):
+            if ca in _inflight:
+                waiting[ca] = _inflight[ca]
+                continue
+            cached = await metadata_cache.get(ca)
+            if cached is not MISSING:
+                results[ca] = EMPTY_METADATA if cached is None else cached
+            elif ca in _inflight:
+                waiting[ca] = _inflight[ca]
+            else:
+                pending[ca] = _inflight[ca] = asyncio.get_running_loop().create_future()
+        if pending:
+            resolved = await resolve_metadata(list(pending))
+    finally:
+        for ca, future in pending.items():
+            _inflight.pop(ca, None)
+            future.set_result(resolved.get(ca, EMPTY_METADATA))
+    results.update(resolved)
+    for ca, future in waiting.items():
+        results[ca] = await asyncio.shield(future)
+    return results
+
+async def resolve_metadata(pending):
+    try:
+        with stage('pda_derivation'):
+            pdas = metadata_pdas(pending)
+        with stage('rpc'):
+            accounts = await get_multipleAccounts(pdas)
+    except Exception as e:
+        logger.warning("Metadata account lookup failed for %d mints: %s", len(pending), e)
+        for ca in pending:
+            metadata_cache.set_negative(ca)
+        return {ca: EMPTY_METADATA for ca in pending}
+
+    semaphore = asyncio.Semaphore(TX_CONCURRENCY)
+
+    async def resolve(ca, account):
+        try:
+            async with semaphore:
+                with stage('offchain'):
+                    metadata = await fetch_metaData(ca, account)
+        except Exception as e:
+            logger.warning("Off-chain metadata fetch failed for %s: %s", ca, e)
+            metadata_cache.set_negative(ca)
+            return ca, EMPTY_METADATA
+        await metadata_cache.set(ca, metadata)
+        return ca, metadata
+
+    decoded = decode_metadata_accounts(accounts)
+    return dict(await asyncio.gather(*(resolve(ca, account) for ca, account in zip(pending, decoded))))
+
+class CircuitBreaker:
+    """Stops requests to a host after repeated failures, retrying one after reset seconds."""
+    def __init__(self, failures: int = BREAKER_FAILURES, reset: float = BREAKER_RESET):
+        self.failures = failures
+        self.reset = reset
+        self.consecutive = 0
+        self.opened_at = None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset:
+            # Half-open: let one request through, the next failure reopens it
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def success(self):
+        self.consecutive = 0
+        self.opened_at = None
+
+    def failure(self):
+        self.consecutive += 1
+        if self.consecutive >= self.failures:
+            self.opened_at = time.monotonic()
+
+def breaker_for(url: str) -> CircuitBreaker:
+    host = urlsplit(url).netloc
+    breaker = _breakers.get(host)
+    if breaker is None:
+        breaker = _breakers[host] = CircuitBreaker()
+    return breaker
+
+def metadata_urls(uri: str) -> list:
+    """Candidate URLs for a metadata URI, every configured gateway for IPFS content."""
+    if uri.startswith('ipfs://'):
+        path = uri[len('ipfs://'):]
+        if path.startswith('ipfs/'):
+            path = path[len('ipfs/'):]
+        return [gateway + path for gateway in IPFS_GATEWAYS]
+    if '/ipfs/' in uri:
+        path = uri.split('/ipfs/', 1)[1]
+        return list(dict.fromkeys([uri] + [gateway + path for gateway in IPFS_GATEWAYS]))
+    return [uri]
+
+async def fetch_json(urls: list, timeout: float = METADATA_TIMEOUT, hedge_delay: float = METADATA_HEDGE_DELAY):
+    """GET the first URL that answers with JSON, hedging across the others.
+
+    The next URL is requested when the ones in flight have failed or have
+    not answered within hedge_delay. Hosts whose circuit breaker is open are
+    skipped; only connection errors, timeouts and 5xx responses count
+    against a host. The losing requests are cancelled.
+    """
+    candidates = [url for url in urls if breaker_for(url).allow()]
+    if len(candidates) < len(urls):
+        METADATA_FETCHES.inc('skipped', amount=len(urls) - len(candidates))
+    if not candidates:
+        raise ValueError(f"Every host for {urls[0]} is failing")
+    session = get_session()
+    request_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def attempt(url):
+        breaker = breaker_for(url)
+        answered = False
+        try:
+            async with session.get(url, timeout=request_timeout) as response:
+                # A 4xx (unpinned CID, unknown mint) is about this URL, not the host
+                answered = response.status < 500
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+        except Exception:
+            if answered:
+                breaker.success()
+            else:
+                breaker.failure()
+            METADATA_FETCHES.inc('error')
+            raise
+        breaker.success()
+        METADATA_FETCHES.inc('ok')
+        return data
+
+    remaining = iter(candidates)
+    in_flight = set()
+    error = None
+    try:
+        while True:
+            url = next(remaining, None)
+            if url is not None:
+                if in_flight:
+                    METADATA_FETCHES.inc('hedged')
+                in_flight.add(asyncio.create_task(attempt(url)))
+            if not in_flight:
+                raise error
+            done, in_flight = await asyncio.wait(in_flight, timeout=hedge_delay if url is not None else None, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+async def fetch_metaData(ca, account):
+    # account is the decoded MetadataAccount for ca, or None if it could not be read
     def ensure_https(url):
         if url and not url.startswith("http"):
             return "https://" + url
         return url
-    try:
-        token_program = Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
-        token_metadata_program = Pubkey.from_string("metaqbxxUerdq28cj1RbAWkYQm3ybzjb6a8bt518x1s")
-        token_pubkey = Pubkey.from_string(ca)
-        metadata_pda = Pubkey.find_program_address([b"metadata", bytes(token_metadata_program), bytes(token_pubkey)], token_metadata_program)[0]
-        account_info = await get_accountInfo(metadata_pda)
-
-        if not account_info or 'result' not in account_info or 'value' not in account_info['result']:
-            raise ValueError(f"Invalid account info for {ca}")
-        
-        data = account_info['result']['value']['data'][0]
-        decoded_data = base64.b64decode(data)
-        metadata = unpack_metadata_account(decoded_data)
-
-        if not metadata or 'data' not in metadata:
-            raise ValueError(f"Invalid metadata for {ca}")
+    if account is None:
+        raise ValueError(f"Invalid metadata for {ca}")
+    
+    uri = account.uri
+    if len(uri) == 0:
+        github_url = f"https://api.github.com/repos/solana-labs/token-list/contents/assets/mainnet/{ca}"
+        github_response = await fetch_json([github_url])
+        if not github_response:
+            raise ValueError(f"No GitHub response for {ca}")
         
-        async with aiohttp.ClientSession() as session:
-            if metadata['data']['uri'] is None or len(metadata['data']['uri']) == 0:
-                github_url = f"https://api.github.com/repos/solana-labs/token-list/contents/assets/mainnet/{ca}"
-                async with session.get(github_url) as response:
-                    github_response = await response.json()
-                if not github_response:
-                    raise ValueError(f"No GitHub response for {ca}")
-                
-                name = metadata['data'].get('name', '')
-                symbol = metadata['data'].get('symbol', metadata['data']['symbol'])
-                logo = github_response[0].get('download_url', None)
-                createdOn = github_response[0].get('createdOn', None)
-                twitter = ensure_https(github_response[0].get('twitter', None))
-                telegram = ensure_https(github_response[0].get('telegram', None))
-                website = ensure_https(github_response[0].get('website', None))
-            else:
-                uri = metadata['data']['uri']
-                async with session.get(uri) as response:
-                    ipfs_response = await response.json()
-                if not ipfs_response:
-                    raise ValueError(f"No IPFS response for {ca}")
-            
-                name = ipfs_response.get('name', '')
-                symbol = ipfs_response.get('symbol', '')
-                logo = ipfs_response.get('image', None)
-                createdOn = ipfs_response.get('createdOn', None)
-                twitter = ensure_https(ipfs_response.get('twitter', None))
-                telegram = ensure_https(ipfs_response.get('telegram', None))
-                website = ensure_https(ipfs_response.get('website', None))
-
-        return name, symbol, logo, createdOn, twitter, telegram, website
-    except Exception as e:
-        print(f"Error in get_metaData: {e}")
-        return None, None, None, None, None, None, None
-
-def is_valid_transaction(webhook_data, address):
-    # Define a threshold for significant native balance change (in lamports)
-    threshold = 5000  # In lamports (1 SOL = 1,000,000 lamports)
-    nativeBalanceChange = [i['nativeBalanceChange'] for i in webhook_data[0]['accountData'] if i['account'] == address][0]
-    if abs(nativeBalanceChange) >= threshold:
-        return True
+        name = account.name
+        symbol = account.symbol
+        logo = github_response[0].get('download_url', None)
+        createdOn = github_response[0].get('createdOn', None)
+        twitter = ensure_https(github_response[0].get('twitter', None))
+        telegram = ensure_https(github_response[0].get('telegram', None))
+        website = ensure_https(github_response[0].get('website', None))
+    else:
+        ipfs_response = await fetch_json(metadata_urls(uri))
+        if not ipfs_response:
+            raise ValueError(f"No IPFS response for {ca}")
     
-    if len(webhook_data[0]['tokenTransfers']) >= 1:
-        return True
-    # If no criteria are met, return False
-    print('not valid transaction')
-    return False
-
-async def swapInfo(data, txh, wallet):  
-    postTokenBalances = data[0]['meta']['postTokenBalances']
-    preTokenBalances = data[0]['meta']['preTokenBalances']
-    token_addresses = [i['mint'] for i in postTokenBalances if i['owner'] == wallet] if len([i['mint'] for i in postTokenBalances if i['owner'] == wallet]) != 0 else []
-    SPL_post_amount = [i['uiTokenAmount']['uiAmountString'] for i in postTokenBalances if i['owner'] == wallet] if [i['uiTokenAmount']['uiAmountString'] for i in postTokenBalances if i['owner'] == wallet] else [0]
-    SPL_pre_amount = [i['uiTokenAmount']['uiAmountString'] for i in preTokenBalances if i['owner'] == wallet] if [i['uiTokenAmount']['uiAmountString'] for i in preTokenBalances if i['owner'] == wallet] else [0]
-    token_change = [float(xi) - float(yi) for xi, yi in zip(SPL_post_amount, SPL_pre_amount)]
-
-    info = None
-    if len(token_addresses) == 2:
-        if token_change[0] > 0:
-            metadata_in = await get_metaData(token_addresses[0])
-            metadata_out = await get_metaData(token_addresses[1])
-            SPL_in = round(abs(token_change[0]),3)
-            SPL_out = round(abs(token_change[1]),3)
-            SPL_in_CA = token_addresses[0]
-            SPL_out_CA = token_addresses[1]
-            SPL_out_symbol = metadata_out[1]
-            logo_out = metadata_out[2] if metadata_out[2] else ""
-            SPL_in_symbol = metadata_in[1]
-            logo_in = metadata_in[2] if metadata_in[2] else ""
-            createdOn_in = metadata_in[3] if metadata_in[3] else None
-            twitter_in = metadata_in[4] if metadata_in[4] else None
-            telegram_in = metadata_in[5] if metadata_in[5] else None
-            website_in = metadata_in[6] if metadata_in[6] else None
-            info = [SPL_out, SPL_out_CA, SPL_out_symbol, logo_out, SPL_in, SPL_in_CA, SPL_in_symbol, logo_in, wallet, txh, createdOn_in, twitter_in, telegram_in, website_in]
-        elif token_change[0] < 0:
-            metadata_in =  await get_metaData(token_addresses[1])
-            metadata_out = await get_metaData(token_addresses[0])
-            SPL_in = round(abs(token_change[1]),3)
-            SPL_out = round(abs(token_change[0]),3)
-            SPL_in_CA = token_addresses[1]
-            SPL_out_CA = token_addresses[0]
-            SPL_out_symbol = metadata_out[1]
-            logo_out = metadata_out[2] if metadata_out[2] else ""
-            SPL_in_symbol = metadata_in[1]
-            logo_in = metadata_in[2] if metadata_in[2] else ""
-            createdOn_in = metadata_in[3] if metadata_in[3] else None
-            twitter_in = metadata_in[4] if metadata_in[4] else None
-            telegram_in = metadata_in[5] if metadata_in[5] else None
-            website_in = metadata_in[6] if metadata_in[6] else None
-            info = [SPL_out, SPL_out_CA, SPL_out_symbol, logo_out, SPL_in, SPL_in_CA, SPL_in_symbol, logo_in, wallet, txh, createdOn_in, twitter_in, telegram_in, website_in]
-    elif len(token_addresses) == 1:
-        SOL_change = (data[0]['meta']['preBalances'][0] - data[0]['meta']['postBalances'][0]) / 1e9
-        if SOL_change > 0:
-            metadata_in = await get_metaData(token_addresses[0])
-            SPL_in = round(abs(token_change[0]),3)
-            SPL_out = round(abs(SOL_change),3)
-            SPL_in_CA = token_addresses[0]
-            SPL_out_CA = 'So11111111111111111111111111111111111111112'
-            SPL_out_symbol = 'SOL'
-            logo_out = 'https://raw.githubusercontent.com/solana-labs/token-list/main/assets/mainnet/So11111111111111111111111111111111111111112/logo.png'
-            SPL_in_symbol = metadata_in[1]
-            logo_in = metadata_in[2] if metadata_in[2] else ""
-            createdOn_in = metadata_in[3] if metadata_in[3] else None
-            twitter_in = metadata_in[4] if metadata_in[4] else None
-            telegram_in = metadata_in[5] if metadata_in[5] else None
-            website_in = metadata_in[6] if metadata_in[6] else None
-            info = [SPL_out, SPL_out_CA, SPL_out_symbol, logo_out, SPL_in, SPL_in_CA, SPL_in_symbol, logo_in, wallet, txh, createdOn_in, twitter_in, telegram_in, website_in]
-        elif SOL_change < 0:
-            metadata_out = await get_metaData(token_addresses[0])
-            SPL_out = round(abs(token_change[0]),3)
-            SPL_out_CA = token_addresses[0]
-            SPL_out_symbol = metadata_out[1]
-            logo_out = metadata_out[2] if metadata_out[2] else ""
-            SPL_in = round(abs(SOL_change),3)
-            SPL_in_CA = 'So11111111111111111111111111111111111111112'
-            SPL_in_symbol = 'SOL'
-            logo_in = 'https://raw.githubusercontent.com/solana-labs/token-list/main/assets/mainnet/So11111111111111111111111111111111111111112/logo.png'
-            createdOn_in = None
-            twitter_in = None
-            telegram_in = None
-            website_in = None
-            info = [SPL_out, SPL_out_CA, SPL_out_symbol, logo_out, SPL_in, SPL_in_CA, SPL_in_symbol, logo_in, wallet, txh, createdOn_in, twitter_in, telegram_in, website_in]
-    print(info)
-    return info       
-            
-async def process_webhook(data, bot):    
+        name = ipfs_response.get('name', '')
+        symbol = ipfs_response.get('symbol', '')
+        logo = ipfs_response.get('image', None)
+        createdOn = ipfs_response.get('createdOn', None)
+        twitter = ensure_https(ipfs_response.get('twitter', None))
+        telegram = ensure_https(ipfs_response.get('telegram', None))
+        website = ensure_https(ipfs_response.get('website', None))
+
+    return name, symbol, logo, createdOn, twitter, telegram, website
+
+async def swapInfo(transaction, txh, wallet, token_metadata=None):
+    swap = parse_swap(transaction, wallet)
+    if swap is None:
+        logger.debug("No swap found for %s in %s", wallet, txh)
+        return None
+    await resolve_swap_metadata(swap, token_metadata)
+    logger.debug('Parsed %r', swap)
+    return swap
+
+async def resolve_swap_metadata(swap, token_metadata=None):
+    if token_metadata is None:
+        token_metadata = await get_metaData_batch(swap.mints)
+    for leg in swap.legs:
+        if leg.metadata is None:
+            leg.metadata = token_metadata.get(leg.mint, EMPTY_METADATA)
+    return swap
+
+def signature_of(transaction) -> str:
+    try:
+        return transaction['transaction']['signatures'][0]
+    except (KeyError, IndexError, TypeError):
+        return '<unknown>'
+
+def parse_swaps(transaction, wallets):
+    """Parse one transaction for every tracked wallet in it, sharing the balance index."""
+    index = index_token_balances(transaction)
+    swaps = []
+    for wallet in wallets:
+        swap = parse_swap(transaction, wallet, index)
+        if swap is None:
+            logger.debug("No swap found for %s in %s", wallet, transaction['transaction']['signatures'][0])
+        else:
+            swaps.append(swap)
+    return swaps
+
+def subscribers_for(swap, bot):
+    return [subscriber for subscriber in bot.wallet_index.get(swap.wallet) if swap_allowed(swap, bot.guild_settings.min_lamports(subscriber.guild))]
+
+async def deliver_swap(swap, bot):
+    bot.swap_history.record(swap)
+    subscribers = subscribers_for(swap, bot)
+    logger.debug("Transaction %s for tracked wallet %s goes to %d subscribers", swap.signature, swap.wallet, len(subscribers))
+    if subscribers:
+        await send_embedded_transaction(swap, subscribers, bot)
+
+async def process_webhook(data, bot, deliver=deliver_swap):
+    """Parse every transaction in a batch once per tracked wallet and dispatch the swaps in slot order.
+
+    deliver(swap, bot) is awaited for each enriched swap; receiver processes
+    pass one that forwards the alert to the gateway instead of sending it.
+    """
     if not data:
-        logger.error("No data received")    
-
-    account_keys = data[0]['transaction']['message']['accountKeys']
-    placeholders = ', '.join(['?'] * len(account_keys))
-    async with aiosqlite.connect("main.db") as db:
-        async with db.cursor() as cursor:
-            query = f'SELECT * FROM wallets WHERE address IN ({placeholders})'
-            await cursor.execute(query, account_keys)
-            rows = await cursor.fetchall()
-            if rows:
-                address_data = {row[1]: row for row in rows} 
-                ordered_address_data = [address_data.get(address) for address in account_keys if address in address_data]
-                if ordered_address_data:
-                    tracked_wallet = ordered_address_data[0][1]
-                    await cursor.execute('SELECT name, channel FROM wallets WHERE address = ?', (tracked_wallet,))
-                    selected_rows = await cursor.fetchall()
-                    nametags = [row[0] for row in selected_rows]
-                    channel_ids = [row[1] for row in selected_rows]
-                    logger.debug(f"Channel IDs for tracked wallet {tracked_wallet}: {channel_ids}")
-            else:
-                print('No tracked wallets found')
-
-    signature = data[0]['transaction']['signatures'][0]
-    logger.info(f"Account info for tracked wallet: {tracked_wallet}")
-    logger.info(f"Transaction Hash is {signature} and the wallet being tracked is {tracked_wallet}.")
-    info = await swapInfo(data, signature, tracked_wallet)
-    await send_embedded_transaction(info, nametags, channel_ids, bot=bot)
-
-async def send_embedded_transaction(info, nametags, channel_ids, bot):
-    print(channel_ids)
-    for i in range(len(channel_ids)):
-        embed = discord.Embed(
-            title="Transaction Detected", 
-            description=f"{nametags[i]} has swapped {format(info[0], ',')} **{info[2]}** for {format(info[4], ',')} **{info[6]}**", 
-            colour=0xf6ee04, 
-            timestamp=datetime.datetime.now()
-        )
-        embed.set_author(name="Swap")
-        embed.add_field(name="Wallet", value=f"[{info[8][:4]}...{info[8][-4:]}](https://solscan.io/account/{info[8]})", inline=True)
-        embed.add_field(name="Transaction", value=f"[{info[9][:4]}...{info[9][-4:]}](https://solscan.io/tx/{info[9]})", inline=True)
-        social_links = []
-        if info[11]:
-            social_links.append(f"[Twitter]({info[11]})")
-        if info[12]:
-            social_links.append(f"[Telegram]({info[12]})")
-        if info[13]:
-            social_links.append(f"[Website]({info[13]})")
-
-        social_links_str = " | ".join(social_links) if social_links else None
-        if social_links_str:
-            embed.add_field(name="Socials", value=social_links_str, inline=False)
-        
-        links = [
-            f"[Photon](https://photon-sol.tinyastro.io/en/r/@proficyio/{info[5]})",
-            f"[BullX](https://bullx.io/terminal?chainId=1399811149&address={info[5]})",
-            f"[DEXScreener](https://dexscreener.com/solana/{info[5]})"
-        ]
-        if info[10] == 'https://pump.fun':
-            links.append(f"[Pumpfun](https://pump.fun/{info[5]})")
-        links_str = " | ".join(links)
-
-        embed.add_field(name="Links", value=links_str, inline=False)
-        if info[5]!= "So11111111111111111111111111111111111111112":
-            embed.add_field(name="Contract Address", value=f"```{info[5]}```", inline=False)
-        embed.set_thumbnail(url=info[7])
-        embed.set_footer(text="Monitor", icon_url="https://slate.dan.onl/slate.png")
-
-        print(channel_ids[i])
-        await bot.wait_until_ready()
-        channel = bot.get_channel(channel_ids[i])
-        print(channel)
-        await channel.send(embed=embed)
-    logger.info(f"Info: {info}")
-    logger.debug("Embed sent successfully.")
-    logging.info("Transaction sent: %s", info)
\ No newline at end of file
+        logger.error("No data received")
+        return
+
+    swaps = []
+    for transaction in data:
+        # A malformed transaction is dropped on its own, the rest of the batch still goes through
+        try:
+            with stage('prefilter'):
+                wallets = bot.prefilter(transaction)
+            if wallets:
+                swaps.extend(parse_swaps(transaction, wallets))
+        except Exception:
+            TRANSACTIONS_DROPPED.inc('malformed')
+            logger.exception("Dropping malformed transaction %s", signature_of(transaction))
+    if not swaps:
+        return
+
+    # Resolve the mints of the whole batch in one go
+    token_metadata = await get_metaData_batch([mint for swap in swaps for mint in swap.mints])
+
+    for swap in sorted(swaps, key=lambda swap: swap.slot):
+        try:
+            await resolve_swap_metadata(swap, token_metadata)
+            await deliver(swap, bot)
+        except Exception as e:
+            logger.error("Failed to process transaction %s: %s", swap.signature, e)
+
+def format_legs(legs):
+    return " + ".join(f"{format(round(leg.amount, 3), ',')} **{leg.symbol}**" for leg in legs)
+
+def build_swap_embed(swap):
+    """Build the parts of a swap alert that are the same for every subscriber."""
+    token_in = swap.token_in
+    metadata_in = token_in.metadata
+    embed = discord.Embed(
+        title="Transaction Detected", 
+        colour=0xf6ee04, 
+        timestamp=datetime.datetime.now()
+    )
+    embed.set_author(name="Swap")
+    embed.add_field(name="Wallet", value=f"[{swap.wallet[:4]}...{swap.wallet[-4:]}](https://solscan.io/account/{swap.wallet})", inline=True)
+    embed.add_field(name="Transaction", value=f"[{swap.signature[:4]}...{swap.signature[-4:]}](https://solscan.io/tx/{swap.signature})", inline=True)
+    social_links = []
+    if metadata_in[4]:
+        social_links.append(f"[Twitter]({metadata_in[4]})")
+    if metadata_in[5]:
+        social_links.append(f"[Telegram]({metadata_in[5]})")
+    if metadata_in[6]:
+        social_links.append(f"[Website]({metadata_in[6]})")
+
+    social_links_str = " | ".join(social_links) if social_links else None
+    if social_links_str:
+        embed.add_field(name="Socials", value=social_links_str, inline=False)
+
+    links = [
+        f"[Photon](https://photon-sol.tinyastro.io/en/r/@proficyio/{token_in.mint})",
+        f"[BullX](https://bullx.io/terminal?chainId=1399811149&address={token_in.mint})",
+        f"[DEXScreener](https://dexscreener.com/solana/{token_in.mint})"
+    ]
+    if metadata_in[3] == 'https://pump.fun':
+        links.append(f"[Pumpfun](https://pump.fun/{token_in.mint})")
+    links_str = " | ".join(links)
+
+    embed.add_field(name="Links", value=links_str, inline=False)
+    if token_in.mint != SOL_MINT:
+        embed.add_field(name="Contract Address", value=f"```{token_in.mint}```", inline=False)
+    embed.set_thumbnail(url=token_in.logo)
+    embed.set_footer(text="Monitor", icon_url="https://slate.dan.onl/slate.png")
+    return embed
+
+def swap_summary(swap) -> str:
+    return f"has swapped {format_legs(swap.sent)} for {format_legs(swap.received)}"
+
+def enqueue_alerts(dispatcher, embed, swapped: str, targets):
+    """Queue one copy of embed per (channel, nametag) target."""
+    for channel, name in targets:
+        # Shallow copy: only the description differs, the field list is shared and never mutated
+        personal = copy.copy(embed)
+        personal.description = f"{name} {swapped}"
+        dispatcher.enqueue(channel, personal)
+
+async def send_embedded_transaction(swap, subscribers, bot):
+    with stage('embed_build'):
+        embed = build_swap_embed(swap)
+        enqueue_alerts(bot.dispatcher, embed, swap_summary(swap), [(subscriber.channel, subscriber.name) for subscriber in subscribers])
+    logger.info("Queued %r for %d channels", swap, len(subscribers))
@@ -0,0 +1,152 @@
+import os
+import json
+import asyncio
+import logging
+from http_client import get_session
+from database import database
+
+logger = logging.getLogger(__name__)
+
+HELIUS_WEBHOOK_URL = os.getenv('HELIUS_WEBHOOK_URL', "https://api.helius.xyz/v0/webhooks/7723a8c5-233e-4180-83f1-d54c40778539")
+WEBHOOK_SYNC_DEBOUNCE = float(os.getenv('WEBHOOK_SYNC_DEBOUNCE', 2))
+# Failed flushes are retried after a delay that doubles up to this many seconds
+WEBHOOK_SYNC_MAX_BACKOFF = float(os.getenv('WEBHOOK_SYNC_MAX_BACKOFF', 300))
+
+class WebhookSync:
+    """Keeps the Helius webhook address list in step with the wallets table.
+
+    addresses is the authoritative local mirror. add() and remove() update it
+    immediately and schedule a debounced flush, so a burst of changes results
+    in a single PUT of the full list. reconcile() compares the mirror with the
+    remote list on startup.
+    """
+    def __init__(self, webhook_url: str = HELIUS_WEBHOOK_URL, api_key: str = None, debounce: float = WEBHOOK_SYNC_DEBOUNCE,
+                 max_backoff: float = WEBHOOK_SYNC_MAX_BACKOFF):
+        self.webhook_url = webhook_url
+        self.api_key = api_key if api_key is not None else os.getenv('HELIUS_KEY')
+        self.debounce = debounce
+        self.max_backoff = max_backoff
+        self.consecutive_failures = 0
+        self.addresses = set()
+        self._pending_add = set()
+        self._pending_remove = set()
+        self._webhook = None
+        self._lock = asyncio.Lock()
+        self._flush_task = None
+        self.flushes = 0
+        self.failures = 0
+
+    @property
+    def _endpoint(self) -> str:
+        return f"{self.webhook_url}?api-key={self.api_key}"
+
+    async def load(self):
+        self.addresses = {row[0] for row in await database.fetchall('SELECT DISTINCT address FROM wallets')}
+        logger.debug("Webhook mirror loaded with %d addresses", len(self.addresses))
+
+    async def _fetch_remote(self) -> dict:
+        async with get_session().get(self._endpoint, headers={'Content-Type': 'application/json'}) as response:
+            response.raise_for_status()
+            self._webhook = await response.json()
+        return self._webhook
+
+    async def _put(self, addresses: list) -> bool:
+        update_payload = {
+            "webhookURL": self._webhook.get('webhookURL', ''),
+            "transactionTypes": self._webhook.get('transactionTypes', []),
+            "accountAddresses": addresses,
+            "webhookType": self._webhook.get('webhookType', ''),
+        }
+        async with get_session().put(self._endpoint, headers={'Content-Type': 'application/json'}, data=json.dumps(update_payload)) as response:
+            if response.status != 200:
+                logger.error("Failed to update the webhook address list (%s)", response.status)
+                return False
+        self._webhook['accountAddresses'] = addresses
+        return True
+
+    async def reconcile(self) -> bool:
+        """Push the local mirror if the remote list has drifted from it."""
+        async with self._lock:
+            try:
+                remote = set((await self._fetch_remote()).get('accountAddresses', []))
+            except Exception as e:
+                logger.error("Could not fetch Helius webhook: %s", e)
+                return False
+            if remote == self.addresses:
+                logger.debug("Helius webhook address list is in sync")
+                return True
+            logger.info("Reconciling Helius webhook: %d missing, %d stale", len(self.addresses - remote), len(remote - self.addresses))
+            self._pending_add.clear()
+            self._pending_remove.clear()
+            return await self._put(sorted(self.addresses))
+
+    def add(self, *addresses: str):
+        for address in addresses:
+            self.addresses.add(address)
+            self._pending_remove.discard(address)
+            self._pending_add.add(address)
+        self._schedule()
+
+    def remove(self, *addresses: str):
+        for address in addresses:
+            self.addresses.discard(address)
+            self._pending_add.discard(address)
+            self._pending_remove.add(address)
+        self._schedule()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending_add) + len(self._pending_remove)
+
+    def _schedule(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    def retry_delay(self) -> float:
+        if not self.consecutive_failures:
+            return self.debounce
+        return min(self.debounce * 2 ** self.consecutive_failures, self.max_backoff)
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.retry_delay())
+        if not await self.flush() or self.pending:
+            # Failed, or more changes arrived during the PUT; go again, backing off while it keeps failing
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> bool:
+        async with self._lock:
+            if not self.pending:
+                return True
+            added, removed = set(self._pending_add), set(self._pending_remove)
+            try:
+                if self._webhook is None:
+                    await self._fetch_remote()
+                ok = await self._put(sorted(self.addresses))
+            except Exception as e:
+                logger.error("Webhook sync failed: %s", e)
+                ok = False
+            if not ok:
+                self.failures += 1
+                self.consecutive_failures += 1
+                return False
+            self.consecutive_failures = 0
+            self._pending_add -= added
+            self._pending_remove -= removed
+            self.flushes += 1
+            logger.debug("Webhook synced: +%d -%d, %d addresses", len(added), len(removed), len(self.addresses))
+            return True
+
+    async def close(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "addresses": len(self.addresses),
+            "pending": self.pending,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+        }
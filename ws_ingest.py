@@ -0,0 +1,250 @@
+import os
+import time
+import asyncio
+import logging
+import aiohttp
+from collections import OrderedDict
+from http_client import get_session
+from payload import loads, project_transaction
+
+logger = logging.getLogger(__name__)
+
+API_KEY = os.getenv('HELIUS_KEY')
+SOLANA_WS_URL = os.getenv('SOLANA_WS_URL', f"wss://mainnet.helius-rpc.com/?api-key={API_KEY}")
+SOLANA_RPC_URL = os.getenv('SOLANA_RPC_URL', f"https://mainnet.helius-rpc.com/?api-key={API_KEY}")
+# 'logs' pushes signatures directly, 'account' polls signatures on every balance change
+WS_SUBSCRIPTION = os.getenv('WS_SUBSCRIPTION', 'logs')
+WS_COMMITMENT = os.getenv('WS_COMMITMENT', 'confirmed')
+WS_BACKFILL_LIMIT = int(os.getenv('WS_BACKFILL_LIMIT', 20))
+WS_FETCH_CONCURRENCY = int(os.getenv('WS_FETCH_CONCURRENCY', 16))
+WS_RECONNECT_MAX = float(os.getenv('WS_RECONNECT_MAX', 30))
+RECENT_SIGNATURES = 10000
+FETCH_RETRIES = 3
+
+def normalize_transaction(result: dict) -> dict:
+    """Shape a getTransaction result like a raw webhook transaction.
+
+    Versioned transactions keep the accounts loaded from lookup tables in
+    meta.loadedAddresses; they are appended to accountKeys so the balance
+    arrays line up with the keys again.
+    """
+    meta = result.get('meta') or {}
+    loaded = meta.get('loadedAddresses')
+    if loaded and (loaded.get('writable') or loaded.get('readonly')):
+        message = result['transaction']['message']
+        message['accountKeys'] = list(message['accountKeys']) + loaded.get('writable', []) + loaded.get('readonly', [])
+    return project_transaction(result)
+
+class WebsocketIngest:
+    """Low-latency ingestion over a Solana JSON-RPC websocket.
+
+    One connection carries a subscription per tracked address. Notifications
+    are turned into transactions with getTransaction and handed to handler,
+    the same entry point the Helius webhook feeds. On reconnect every address
+    is resubscribed and up to backfill_limit signatures per address that
+    landed while disconnected are fetched, duplicates are dropped by the
+    pipeline's signature dedup.
+    """
+    def __init__(self, handler, addresses=(), ws_url: str = SOLANA_WS_URL, rpc_url: str = SOLANA_RPC_URL,
+                 subscription: str = WS_SUBSCRIPTION, commitment: str = WS_COMMITMENT,
+                 backfill_limit: int = WS_BACKFILL_LIMIT, fetch_concurrency: int = WS_FETCH_CONCURRENCY):
+        self.handler = handler
+        self.addresses = set(addresses)
+        self.ws_url = ws_url
+        self.rpc_url = rpc_url
+        self.subscription = subscription
+        self.commitment = commitment
+        self.backfill_limit = backfill_limit
+        self._semaphore = asyncio.Semaphore(fetch_concurrency)
+        self._ws = None
+        self._task = None
+        self._tasks = set()
+        self._next_id = 0
+        self._requests = {}
+        self._subscriptions = {}
+        self._by_address = {}
+        self._recent = OrderedDict()
+        self._last_signature = {}
+        self._disconnected_at = None
+        self.notifications = 0
+        self.fetched = 0
+        self.backfilled = 0
+        self.reconnects = 0
+        self.failed = 0
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run(), name="ws-ingest")
+
+    def subscribe(self, *addresses):
+        for address in addresses:
+            if address not in self.addresses:
+                self.addresses.add(address)
+                self._spawn(self._subscribe(address))
+
+    def unsubscribe(self, *addresses):
+        for address in addresses:
+            self.addresses.discard(address)
+            subscription_id = self._by_address.pop(address, None)
+            if subscription_id is not None:
+                self._subscriptions.pop(subscription_id, None)
+                self._spawn(self._send(f"{self.subscription}Unsubscribe", [subscription_id]))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, method: str, params: list, address: str = None):
+        if self._ws is None or self._ws.closed:
+            return
+        self._next_id += 1
+        if address is not None:
+            self._requests[self._next_id] = address
+        await self._ws.send_json({"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params})
+
+    async def _subscribe(self, address: str):
+        if self.subscription == 'account':
+            params = [address, {"commitment": self.commitment, "encoding": "base64"}]
+        else:
+            params = [{"mentions": [address]}, {"commitment": self.commitment}]
+        await self._send(f"{self.subscription}Subscribe", params, address)
+
+    async def _run(self):
+        delay = 0.5
+        while True:
+            try:
+                async with get_session().ws_connect(self.ws_url, heartbeat=30) as ws:
+                    self._ws = ws
+                    delay = 0.5
+                    logger.info("Websocket connected, subscribing to %d addresses", len(self.addresses))
+                    await asyncio.gather(*(self._subscribe(address) for address in list(self.addresses)))
+                    if self._disconnected_at is not None:
+                        self._spawn(self._backfill(list(self.addresses), self._disconnected_at))
+                        self._disconnected_at = None
+                    async for message in ws:
+                        if message.type == aiohttp.WSMsgType.TEXT:
+                            self._on_message(loads(message.data))
+                        elif message.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Websocket connection failed: %s", e)
+            self._ws = None
+            self._requests.clear()
+            self._subscriptions.clear()
+            self._by_address.clear()
+            if self._disconnected_at is None:
+                self._disconnected_at = time.time()
+            self.reconnects += 1
+            logger.info("Websocket disconnected, reconnecting in %.1fs", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WS_RECONNECT_MAX)
+
+    def _on_message(self, message: dict):
+        if 'id' in message:
+            address = self._requests.pop(message['id'], None)
+            if address is None:
+                return
+            if 'error' in message:
+                logger.error("Subscription for %s failed: %s", address, message['error'])
+            elif address in self.addresses:
+                self._subscriptions[message['result']] = address
+                self._by_address[address] = message['result']
+            return
+        params = message.get('params') or {}
+        address = self._subscriptions.get(params.get('subscription'))
+        if address is None:
+            return
+        self.notifications += 1
+        if message.get('method') == 'logsNotification':
+            value = params['result']['value']
+            if value.get('err') is None:
+                self._spawn(self._fetch_and_handle(value['signature'], address))
+        elif message.get('method') == 'accountNotification':
+            self._spawn(self._catch_up(address))
+
+    async def _rpc(self, method: str, params: list):
+        payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        async with self._semaphore:
+            async with get_session().post(self.rpc_url, json=payload) as response:
+                json_response = await response.json(loads=loads)
+        if json_response.get('error') is not None:
+            raise ValueError(f"{method} failed: {json_response['error']}")
+        return json_response['result']
+
+    def _claim(self, signature: str) -> bool:
+        if signature in self._recent:
+            return False
+        self._recent[signature] = None
+        if len(self._recent) > RECENT_SIGNATURES:
+            self._recent.popitem(last=False)
+        return True
+
+    async def _fetch_and_handle(self, signature: str, address: str):
+        if not self._claim(signature):
+            return
+        self._last_signature[address] = signature
+        try:
+            for attempt in range(FETCH_RETRIES):
+                result = await self._rpc('getTransaction', [signature, {"encoding": "json", "commitment": self.commitment, "maxSupportedTransactionVersion": 0}])
+                if result is not None:
+                    break
+                # The node that notified can be ahead of the one answering RPC
+                await asyncio.sleep(0.1 * (attempt + 1))
+            else:
+                logger.warning("Transaction %s not found after %d attempts", signature, FETCH_RETRIES)
+                self.failed += 1
+                return
+            self.fetched += 1
+            await self.handler([normalize_transaction(result)])
+        except Exception as e:
+            self.failed += 1
+            logger.error("Failed to ingest %s: %s", signature, e)
+
+    async def _signatures(self, address: str, since: float = None) -> list:
+        options = {"limit": self.backfill_limit, "commitment": self.commitment}
+        if address in self._last_signature:
+            options["until"] = self._last_signature[address]
+        elif since is None:
+            # Nothing seen for this address yet, only the change that was just notified is new
+            options["limit"] = 1
+        signatures = await self._rpc('getSignaturesForAddress', [address, options])
+        return [entry['signature'] for entry in reversed(signatures)
+                if entry.get('err') is None and (since is None or entry.get('blockTime') is None or entry['blockTime'] >= since)]
+
+    async def _catch_up(self, address: str, since: float = None):
+        try:
+            signatures = await self._signatures(address, since)
+        except Exception as e:
+            logger.error("Could not list signatures for %s: %s", address, e)
+            return
+        for signature in signatures:
+            await self._fetch_and_handle(signature, address)
+        return len(signatures)
+
+    async def _backfill(self, addresses: list, since: float):
+        counts = await asyncio.gather(*(self._catch_up(address, since - 1) for address in addresses))
+        backfilled = sum(count or 0 for count in counts)
+        self.backfilled += backfilled
+        logger.info("Backfilled %d transactions for %d addresses", backfilled, len(addresses))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self._ws is not None and not self._ws.closed,
+            "addresses": len(self.addresses),
+            "subscriptions": len(self._subscriptions),
+            "notifications": self.notifications,
+            "fetched": self.fetched,
+            "backfilled": self.backfilled,
+            "reconnects": self.reconnects,
+            "failed": self.failed,
+        }